@@ -0,0 +1,402 @@
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Benchmark de jsontocsv.py sobre datos sintéticos.
+# Genera archivos <Country>-<TYPE>.json y token.json en una carpeta temporal, a escala
+# 1x/10x/100x de --base-ms microservicios, y por cada escala:
+#   - ejecuta el script completo en un subproceso (tiempo total y pico de memoria RSS)
+#   - ejecuta las etapas por separado en otro subproceso (carga, aplanado, dimensiones,
+#     app_type, DRS, ids de pipeline, escritura de CSVs) y mide cada una
+#   - con --json-backends, mide la carga y el parseo con cada backend JSON (json / orjson)
+# Los resultados se guardan en JSON (--output) y se pueden comparar con los de otra
+# versión (--compare) para detectar regresiones, por ejemplo:
+#   python benchmark.py --output bench-main.json
+#   python benchmark.py --output bench-rama.json --compare bench-main.json
+# Con --baseline se corre además otra versión del script de punta a punta:
+#   git show HEAD~1:jsontocsv.py > /tmp/jsontocsv_old.py
+#   python benchmark.py --scales 1 10 --baseline /tmp/jsontocsv_old.py
+
+COUNTRIES = ['Argentina', 'Chile', 'Colombia', 'Peru', 'Mexico', 'Brasil', 'Uruguay', 'Ecuador']
+ENV_TOKENS = ['dev', 'uat', 'prd']
+# Diferencia mínima (segundos) para marcar una etapa como regresión
+MIN_DELTA_S = 0.05
+STAGES = ['load', 'flatten', 'dimensions', 'app_type', 'drs', 'pipeline_ids', 'csv_write']
+
+
+# ========== GENERADOR DE DATOS SINTÉTICOS ==========
+
+def quota_item(rng):
+    item = {
+        'cpuLimits': f"{rng.choice([250, 500, 700, 1000])}m",
+        'cpuRequest': f"{rng.choice([100, 250, 350])}m",
+        'memoryLimits': rng.choice(['512Mi', '1Gi', '2Gi']),
+        'memoryRequest': rng.choice(['256Mi', '512Mi', '1Gi']),
+    }
+    # A veces sin replicas (el script usa 1 por defecto)
+    if rng.random() < 0.9:
+        item['replicas'] = rng.randint(1, 5)
+    return item
+
+
+def quota(rng):
+    # Formas reales: un ítem, varios ítems (se usa el primero) o lista vacía
+    shape = rng.random()
+    if shape < 0.05:
+        return []
+    if shape < 0.15:
+        return [quota_item(rng) for _ in range(rng.randint(2, 3))]
+    return [quota_item(rng)]
+
+
+def ms_config(rng, app, country):
+    config = {
+        'appName': app,
+        'country': country,
+        'ocpLabel': f"label{app}",
+        'project': app.lower(),
+        'baseImageVersion': rng.choice(['1.0', '1.1', '2.0', '']),
+        'usage': rng.choice(['internal', 'external', '']),
+        'secrets': [{'secret': rng.random() < 0.8, 'secretName': f"secret{app}"}],
+        'configMaps': [{'configMap': rng.random() < 0.8, 'configMapName': f"map{app}"}],
+        'volumes': [{'volume': rng.random() < 0.5, 'mountPath': f"/data{app}"}],
+        'resQuotasdev': quota(rng),
+        'drsDeployEnable': rng.random() < 0.5,
+    }
+    # qa y master no siempre están: heredan de dev o quedan sin cuota
+    if rng.random() < 0.5:
+        config['resQuotasqa'] = quota(rng)
+    if rng.random() < 0.9:
+        config['resQuotasmaster'] = quota(rng)
+    if config['drsDeployEnable']:
+        config['drs_token'] = f"drsToken{app}"
+        config['drs_namespace'] = f"drs-{app.lower()}"
+    return config
+
+
+def generate_inputs(folder, total_ms, projects_per_country=50, seed=0, countries=4, types=('MICROSERVICES',)):
+    # Escribe <Country>-<TYPE>.json y token.json; devuelve la cantidad de microservicios
+    rng = random.Random(seed)
+    folder = Path(folder)
+    tokens = []
+    files = [(country, app_type) for country in COUNTRIES[:countries] for app_type in types]
+    per_file = max(1, total_ms // len(files))
+    for country, app_type in files:
+        n_projects = min(projects_per_country, per_file)
+        prefix = f"{country[:3]}{app_type[:2].title()}"
+        projects = [{'name': f"{prefix}Proj{p} Project", 'ms': []} for p in range(n_projects)]
+        for i in range(per_file):
+            app = f"{prefix}App{i}"
+            config = ms_config(rng, app, country)
+            projects[i % n_projects]['ms'].append({
+                'repositoryUrl': f"https://github.com/empresa/{app.lower()}",
+                'buildConfigurationMode': 'Release',
+                'tokenOcp': f"ocToken{app}",
+                'config': json.dumps(config),
+            })
+            for env in ENV_TOKENS:
+                tokens.append({
+                    'tokenname': f"ocToken{app}{env}",
+                    'tokens': f"token-{app.lower()}{env}",
+                    'namespace': f"namespace-{app.lower()}{env}",
+                    'status': config['usage'],
+                })
+        with open(folder / f"{country}-{app_type}.json", 'w', encoding='utf-8') as f:
+            json.dump({'project': projects}, f)
+    with open(folder / 'token.json', 'w', encoding='utf-8') as f:
+        json.dump(tokens, f)
+    return per_file * len(files)
+
+
+# ========== EJECUCIÓN DE PUNTA A PUNTA ==========
+
+def wait_child(proc, timeout):
+    # Espera al hijo con os.wait4 para obtener su propio pico de memoria (ru_maxrss, en KB en Linux).
+    # Devuelve (pico en MB, salida), con pico None si hubo que matarlo por tiempo. La salida
+    # (si stdout es PIPE) se lee con el timer ya corriendo: un hijo colgado no bloquea la lectura.
+    expired = threading.Event()
+
+    def kill():
+        expired.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        out = None
+        if proc.stdout is not None:
+            with proc.stdout:
+                out = proc.stdout.read()
+        _, status, rusage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if expired.is_set():
+        return None, out
+    if proc.returncode != 0:
+        raise SystemExit(f"{' '.join(proc.args)} terminó con código {proc.returncode}")
+    return round(rusage.ru_maxrss / 1024, 1), out
+
+
+def run_script(script, folder, timeout):
+    # (segundos, pico de RSS en MB) del script completo, o (None, None) si se pasó del tiempo
+    # El script corre desde su ubicación (para que encuentre sus módulos hermanos) con cwd en los datos
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(script)], cwd=folder, stdout=subprocess.DEVNULL)
+    peak, _ = wait_child(proc, timeout)
+    if peak is None:
+        return None, None
+    return time.perf_counter() - start, peak
+
+
+# ========== ETAPAS POR SEPARADO ==========
+
+def load_script(script):
+    sys.path.insert(0, str(Path(script).parent))
+    spec = importlib.util.spec_from_file_location('jsontocsv_bench', script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_stages(script, folder):
+    # Corre cada etapa de la corrida completa con las funciones del script y mide su duración.
+    # Se ejecuta en un subproceso propio (--stages) para no mezclar memoria entre escalas.
+    os.chdir(folder)
+    jt = load_script(script)
+    timings = {}
+
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = timings.get(name, 0) + time.perf_counter() - start
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with stage('load'):
+            catalog = jt.SourceCatalog.scan([jt.json_folder], exclude_names=(jt.token_file.name,))
+            sources = catalog.paths
+            documents = []
+            for source in sources:
+                documents.append(jt.load_file(source))
+            token_list = jt.load_file(jt.token_file)
+        with stage('flatten'):
+            results = [(source.name, None, jt.flatten_document(data)) for source, data in zip(sources, documents)]
+            del documents
+        with stage('dimensions'):
+            token_resolver = jt.TokenResolver(token_list)
+            state = jt.IngestState(jt.read_token_id_map(jt.csv_folder), jt.openshift_combination_ids, catalog=catalog)
+            microservice_rows, general_rows = jt.collect_rows(state, jt.merge_records(state, results))
+            app_general_rows = jt.build_app_general_rows(general_rows)
+        with stage('pipeline_ids'):
+            jt.assign_default_pipeline_ids(general_rows)
+        with stage('app_type'):
+            jt.assign_app_types(general_rows, catalog)
+        with stage('drs'):
+            drs_rows, filtered_microservice_rows = jt.build_drs_config(microservice_rows, general_rows)
+        with stage('pipeline_ids'):
+            jt.map_pipeline_ids(general_rows)
+        with stage('csv_write'):
+            output = jt.OutputStage(jt.csv_folder)
+            output.write_rows('app_general_properties.csv', state.model.app_headers, app_general_rows)
+            output.write_rows('microservice_drs_config.csv', state.model.drs_headers, drs_rows)
+            output.write_rows('microservice_properties_directory.csv', state.ms_headers, filtered_microservice_rows)
+            jt.write_dimension_csvs(output, state, token_resolver)
+            output.commit()
+    return {name: round(timings[name], 4) for name in STAGES}
+
+
+def run_json_backend(script, folder, backend):
+    # Carga (mmap + parseo de los exports y token.json) y parse_source completo (con los
+    # 'config' anidados y el aplanado) con un backend de jsonbackend.py
+    os.chdir(folder)
+    jt = load_script(script)
+    import jsonbackend
+    try:
+        jsonbackend.use_backend(backend)
+    except ValueError as e:
+        return {'error': str(e)}
+    sources = jt.list_sources(jt.json_folder, jt.token_file)
+    start = time.perf_counter()
+    documents = [jsonbackend.load_file(source) for source in sources]
+    jsonbackend.load_file(jt.token_file)
+    load = time.perf_counter() - start
+    del documents
+    start = time.perf_counter()
+    for source in sources:
+        jt.parse_source(source)
+    parse = time.perf_counter() - start
+    return {'load': round(load, 4), 'parse': round(parse, 4)}
+
+
+def measure_json_backends(script, folder, timeout, backends=('json', 'orjson')):
+    # {backend: {'load', 'parse', 'peak_rss_mb'}}, cada backend en su propio subproceso
+    results = {}
+    for backend in backends:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--json-backend-stage', backend,
+                                 str(script), str(folder)], stdout=subprocess.PIPE, text=True)
+        try:
+            peak, out = wait_child(proc, timeout)
+        except SystemExit as e:
+            print(f"⚠️ No se pudo medir el backend {backend}: {e}", file=sys.stderr)
+            continue
+        if peak is None:
+            continue
+        result = json.loads(out)
+        if 'error' in result:
+            print(f"⚠️ Backend {backend} no disponible: {result['error']}", file=sys.stderr)
+            continue
+        results[backend] = dict(result, peak_rss_mb=peak)
+    return results
+
+
+def measure_stages(script, folder, timeout):
+    # Etapas y pico de RSS del subproceso; None si el script no expone las etapas o se pasó del tiempo
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--stages', str(script), str(folder)],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        peak, out = wait_child(proc, timeout)
+    except SystemExit as e:
+        print(f"⚠️ No se pudieron medir las etapas: {e}", file=sys.stderr)
+        return None, None
+    if peak is None:
+        return None, None
+    return json.loads(out), peak
+
+
+# ========== RESULTADOS ==========
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results, previous, tolerance):
+    # Imprime la variación por etapa contra una corrida anterior; devuelve la cantidad de regresiones
+    before = {run['scale']: run for run in previous.get('runs', [])}
+    regressions = 0
+    print(f"\nComparación contra {previous.get('revision') or 'corrida anterior'} (tolerancia {tolerance:.0%}):")
+    if previous.get('params') != results['params']:
+        print(f"  ⚠️ Parámetros distintos: {previous.get('params')} vs {results['params']}")
+    for run in results['runs']:
+        old = before.get(run['scale'])
+        if old is None:
+            continue
+        pairs = [('total', old.get('total_s'), run.get('total_s')),
+                 ('pico_rss_mb', old.get('peak_rss_mb'), run.get('peak_rss_mb'))]
+        pairs += [(name, (old.get('stages') or {}).get(name), (run.get('stages') or {}).get(name)) for name in STAGES]
+        for name, a, b in pairs:
+            if not a or b is None:
+                continue
+            ratio = b / a
+            flag = ''
+            # Las etapas de pocos milisegundos son ruido: solo cuentan si además suben más de MIN_DELTA_S
+            if ratio > 1 + tolerance and (name == 'pico_rss_mb' or b - a > MIN_DELTA_S):
+                flag = '  ⚠️ regresión'
+                regressions += 1
+            print(f"  {run['scale']:>4}x {name:<13} {a:>9.3f} -> {b:>9.3f} ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def fmt(value, unit='s'):
+    return '-' if value is None else f"{value:.2f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de jsontocsv.py con datos sintéticos')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help='Escalas a medir, en múltiplos de --base-ms (por defecto 1 10 100)')
+    parser.add_argument('--base-ms', type=int, default=1000, help='Microservicios a escala 1x')
+    parser.add_argument('--countries', type=int, default=4, choices=range(1, len(COUNTRIES) + 1),
+                        help='Cantidad de países (archivos por tipo)')
+    parser.add_argument('--types', nargs='+', default=['MICROSERVICES'],
+                        help='Tipos de app: un archivo <Country>-<TYPE>.json por país y tipo')
+    parser.add_argument('--projects', type=int, default=50, help='Proyectos por archivo')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--script', default='jsontocsv.py', help='Script a medir')
+    parser.add_argument('--baseline', help='Versión anterior del script para comparar de punta a punta')
+    parser.add_argument('--timeout', type=float, default=600, help='Tiempo máximo por corrida (segundos)')
+    parser.add_argument('--output', help='Guardar los resultados en este archivo JSON')
+    parser.add_argument('--compare', help='Resultados JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Aumento relativo a partir del cual se marca una regresión (por defecto 0.2)')
+    parser.add_argument('--json-backends', action='store_true',
+                        help='Comparar además los backends JSON (json / orjson) en carga y parseo de cada escala')
+    parser.add_argument('--stages', nargs=2, metavar=('SCRIPT', 'FOLDER'), help=argparse.SUPPRESS)
+    parser.add_argument('--json-backend-stage', nargs=3, metavar=('BACKEND', 'SCRIPT', 'FOLDER'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stages:
+        print(json.dumps(run_stages(*args.stages)))
+        return
+    if args.json_backend_stage:
+        backend, script, folder = args.json_backend_stage
+        print(json.dumps(run_json_backend(script, folder, backend)))
+        return
+
+    script = Path(args.script).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': {'base_ms': args.base_ms, 'countries': args.countries, 'types': args.types,
+                   'projects': args.projects, 'seed': args.seed},
+        'runs': [],
+    }
+    print(f"{'escala':>6} {'ms':>8} {'MB json':>8} {'total':>9} {'pico RSS':>10} {'baseline':>9}  etapas")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            n = generate_inputs(tmp, args.base_ms * scale, args.projects, args.seed, args.countries, args.types)
+            input_mb = sum(f.stat().st_size for f in Path(tmp).glob('*.json')) / 2**20
+            elapsed, peak = run_script(script, tmp, args.timeout)
+            shutil.rmtree(Path(tmp) / 'csv_output', ignore_errors=True)
+            stages, stages_peak = measure_stages(script, tmp, args.timeout)
+            base_elapsed = None
+            if baseline:
+                shutil.rmtree(Path(tmp) / 'csv_output', ignore_errors=True)
+                base_elapsed, _ = run_script(baseline, tmp, args.timeout)
+            json_backends = measure_json_backends(script, tmp, args.timeout) if args.json_backends else None
+        run = {'scale': scale, 'ms': n, 'input_mb': round(input_mb, 2), 'total_s': elapsed and round(elapsed, 4),
+               'peak_rss_mb': peak, 'stages': stages, 'stages_peak_rss_mb': stages_peak}
+        if baseline:
+            run['baseline_s'] = base_elapsed and round(base_elapsed, 4)
+        if json_backends is not None:
+            run['json_backends'] = json_backends
+        results['runs'].append(run)
+        detail = ' '.join(f"{k}={v:.2f}" for k, v in stages.items()) if stages else '-'
+        print(f"{scale:>5}x {n:>8} {input_mb:>8.1f} {fmt(elapsed):>9} {fmt(peak, ' MB'):>10} "
+              f"{fmt(base_elapsed) if baseline else '-':>9}  {detail}")
+        for backend, r in (json_backends or {}).items():
+            print(f"{'':>6} {'json:' + backend:>17}  carga {fmt(r['load']):>7}  parse_source {fmt(r['parse']):>7}  "
+                  f"pico RSS {fmt(r['peak_rss_mb'], ' MB')}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if compare_results(results, previous, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
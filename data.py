@@ -1,33 +1,481 @@
+import argparse
 import csv
 import json
+import os
+import signal
+import socket
+import socketserver
+import sqlite3
+import stat
 import sys
+import tempfile
+import threading
+from bisect import bisect_left
+from pathlib import Path
 
 # Ruta del archivo CSV
 archivo_csv = "ProjectsJenkinsCardifCSV.csv"
 
-# Abrir y leer el archivo CSV
-def buscarProyecto(nombreProyecto, namespace, archivoExcel):
-    data = []
+NAMESPACE_COLUMNS = ["NameSpaceDev", "NameSpaceUat", "NameSpacePrd", "NameSpaceDrs"]
+
+
+# ========== ÍNDICE EN DISCO ==========
+# El CSV se parsea una sola vez y se guarda un índice junto a él (<csv>.idx), que es
+# una base SQLite:
+#   meta(formato, tamano, mtime_ns,      firma del CSV con la que se armó el índice y
+#        columnas)                       sus columnas (lista JSON)
+#   filas(posicion, fila)                valores de cada fila como lista JSON, en el orden de columnas
+#   claves(app, namespace, posicion)     clave primaria (app, namespace, posicion)
+# Una búsqueda abre la base en solo lectura, compara la firma y baja por la clave
+# primaria: lee solo las filas que coinciden, sin cargar el resto del índice. El índice
+# se reconstruye cuando cambian el tamaño o el mtime del CSV. La base es solo datos: un
+# .idx ajeno, manipulado o de un formato anterior no ejecuta nada, se vuelve a armar.
+
+INDEX_FORMATO = 'PJIDX003'
+
+
+def ruta_indice(archivoExcel):
+    return f"{archivoExcel}.idx"
+
+
+def firma_csv(archivoExcel):
+    st = os.stat(archivoExcel)
+    return st.st_size, st.st_mtime_ns
+
+
+def clave_indice(nombreProyecto, namespace):
+    return f"{nombreProyecto}\0{namespace}"
+
+
+def render_fila(fila_limpia):
+    # Cada fila indentada como elemento de la lista que arma json.dumps(data, indent=4)
+    return '    ' + json.dumps(fila_limpia, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+
+
+def render_resultado(filas):
+    if filas:
+        return '[\n' + ',\n'.join(render_fila(fila) for fila in filas) + '\n]'
+    else:
+        return "No_Data"
+
+
+def construir_indice(archivoExcel):
+    # (columnas, filas como listas JSON de valores, claves -> posiciones)
+    filas = []
+    claves = {}
     with open(archivoExcel, mode='r', encoding='utf-8-sig') as archivo:
         lector_csv = csv.DictReader(archivo, delimiter=";")
-        # Iterar sobre las filas del archivo CSV
+        # Mismas claves y en el mismo orden que cada fila_limpia
+        columnas = list(dict.fromkeys(c.strip() for c in lector_csv.fieldnames or ()))
         for fila in lector_csv:
             fila_limpia = {clave.strip(): valor.strip('[]') for clave, valor in fila.items()}
+            posicion = len(filas)
+            filas.append(json.dumps(list(fila_limpia.values()), ensure_ascii=False, separators=(',', ':')))
+            app = fila_limpia.get('appName')
+            if app is None:
+                continue
+            # Si no existe la columna cuenta como "", igual que la búsqueda fila por fila
+            for namespace in dict.fromkeys(fila_limpia.get(col, "") for col in NAMESPACE_COLUMNS):
+                claves.setdefault(clave_indice(app, namespace), []).append(posicion)
+    return columnas, filas, claves
+
+
+def decodificar_fila(columnas, fila):
+    return dict(zip(columnas, json.loads(fila)))
+
+
+def escribir_indice(ruta, firma, columnas, filas, claves):
+    # Escritura atómica: la base se arma en un temporal y se reemplaza de una vez, así
+    # otro proceso nunca lee un índice a medio escribir
+    try:
+        fd, tmp = tempfile.mkstemp(prefix='.idx-', dir=os.path.dirname(os.path.abspath(ruta)))
+    except OSError:
+        return  # Sin permisos de escritura: la búsqueda sigue con el índice en memoria
+    os.close(fd)
+    try:
+        os.chmod(tmp, 0o644)
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.executescript("""
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE meta (formato TEXT NOT NULL, tamano INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                                   columnas TEXT NOT NULL);
+                CREATE TABLE filas (posicion INTEGER PRIMARY KEY, fila TEXT NOT NULL);
+                CREATE TABLE claves (app TEXT NOT NULL, namespace TEXT NOT NULL, posicion INTEGER NOT NULL,
+                                     PRIMARY KEY (app, namespace, posicion)) WITHOUT ROWID;
+            """)
+            with conn:
+                conn.execute("INSERT INTO meta VALUES (?, ?, ?, ?)",
+                             (INDEX_FORMATO, *firma, json.dumps(columnas, ensure_ascii=False)))
+                conn.executemany("INSERT INTO filas VALUES (?, ?)", enumerate(filas))
+                conn.executemany("INSERT INTO claves VALUES (?, ?, ?)", sorted(
+                    (*clave.split('\0', 1), posicion)
+                    for clave, posiciones in claves.items() for posicion in posiciones))
+        finally:
+            conn.close()
+        os.replace(tmp, ruta)
+    except (OSError, sqlite3.Error):
+        os.unlink(tmp)
+
+
+def abrir_indice(ruta, firma):
+    # (conexión de solo lectura, columnas) del índice, o None si se armó con otra versión del CSV
+    conn = sqlite3.connect(f"{Path(os.path.abspath(ruta)).as_uri()}?mode=ro", uri=True)
+    try:
+        meta = conn.execute("SELECT formato, tamano, mtime_ns, columnas FROM meta").fetchone()
+        if meta is None or meta[:3] != (INDEX_FORMATO, *firma):
+            conn.close()
+            return None
+        columnas = json.loads(meta[3])
+        if not isinstance(columnas, list) or not all(isinstance(c, str) for c in columnas):
+            raise ValueError("Índice con columnas inválidas")
+    except BaseException:
+        conn.close()
+        raise
+    return conn, columnas
+
+
+ERRORES_INDICE = (OSError, ValueError, sqlite3.Error)
+
+
+def leer_indice(ruta, firma, nombreProyecto, namespace):
+    # Filas (dicts) de la clave según el índice en disco, o None si no existe o está desactualizado
+    try:
+        abierto = abrir_indice(ruta, firma)
+        if abierto is None:
+            return None
+        conn, columnas = abierto
+        try:
+            return [decodificar_fila(columnas, fila) for fila, in conn.execute(
+                "SELECT f.fila FROM claves c JOIN filas f ON f.posicion = c.posicion "
+                "WHERE c.app = ? AND c.namespace = ? ORDER BY c.posicion", (nombreProyecto, namespace))]
+        finally:
+            conn.close()
+    except ERRORES_INDICE:
+        return None
+
+
+def cargar_indice(conn):
+    # (filas, claves) completos, como los arma construir_indice
+    filas = []
+    for posicion, fila in conn.execute("SELECT posicion, fila FROM filas ORDER BY posicion"):
+        if posicion != len(filas):
+            raise ValueError("Índice con filas faltantes")
+        filas.append(fila)
+    claves = {}
+    for app, namespace, posicion in conn.execute("SELECT app, namespace, posicion FROM claves"):
+        if not 0 <= posicion < len(filas):
+            raise ValueError("Índice con posiciones inválidas")
+        claves.setdefault(clave_indice(app, namespace), []).append(posicion)
+    return filas, claves
+
+
+class IndiceProyectos:
+    # Índice completo en memoria, para responder muchas consultas con una sola carga.
+    # Además de appName + namespace responde por namespace, por prefijo de appName y los
+    # namespaces de una app; esos índices se arman desde las claves la primera vez que se usan.
+    def __init__(self, archivoExcel):
+        self.archivoExcel = archivoExcel
+        self.firma = firma_csv(archivoExcel)
+        self.por_app = None
+        self.por_namespace = None
+        self.apps = None
+        ruta = ruta_indice(archivoExcel)
+        try:
+            abierto = abrir_indice(ruta, self.firma)
+            if abierto is not None:
+                conn, self.columnas = abierto
+                try:
+                    self.filas, self.claves = cargar_indice(conn)
+                    return
+                finally:
+                    conn.close()
+        except ERRORES_INDICE:
+            pass
+        self.columnas, self.filas, self.claves = construir_indice(archivoExcel)
+        escribir_indice(ruta, self.firma, self.columnas, self.filas, self.claves)
+
+    def fila(self, posicion):
+        return decodificar_fila(self.columnas, self.filas[posicion])
+
+    def buscar(self, nombreProyecto, namespace):
+        return [self.fila(i) for i in self.claves.get(clave_indice(nombreProyecto, namespace), ())]
+
+    def _indices_inversos(self):
+        # appName -> posiciones, namespace -> posiciones y appNames ordenados (para bisect)
+        if self.por_app is not None:
+            return
+        por_app, por_namespace = {}, {}
+        for clave, posiciones in self.claves.items():
+            app, namespace = clave.split('\0', 1)
+            por_app.setdefault(app, set()).update(posiciones)
+            por_namespace.setdefault(namespace, set()).update(posiciones)
+        self.por_namespace = {namespace: sorted(p) for namespace, p in por_namespace.items()}
+        self.apps = sorted(por_app)
+        self.por_app = {app: sorted(p) for app, p in por_app.items()}
+
+    def buscar_namespace(self, namespace):
+        # Filas de todas las apps con namespace en alguna columna NameSpace*
+        self._indices_inversos()
+        return [self.fila(i) for i in self.por_namespace.get(namespace, ())]
+
+    def buscar_prefijo(self, prefijo):
+        # Filas de las apps cuyo appName empieza con prefijo, ordenadas por appName
+        self._indices_inversos()
+        filas = []
+        for i in range(bisect_left(self.apps, prefijo), len(self.apps)):
+            app = self.apps[i]
+            if not app.startswith(prefijo):
+                break
+            filas.extend(self.fila(p) for p in self.por_app[app])
+        return filas
+
+    def namespaces(self, nombreProyecto):
+        # Por cada fila de la app: appName y sus namespaces Dev/Uat/Prd/Drs
+        self._indices_inversos()
+        resultado = []
+        for posicion in self.por_app.get(nombreProyecto, ()):
+            fila = self.fila(posicion)
+            resultado.append({col: fila.get(col, "") for col in ['appName'] + NAMESPACE_COLUMNS})
+        return resultado
+
+
+# Abrir y leer el archivo CSV
+def buscarProyecto(nombreProyecto, namespace, archivoExcel):
+    firma = firma_csv(archivoExcel)
+    ruta = ruta_indice(archivoExcel)
+    data = leer_indice(ruta, firma, nombreProyecto, namespace)
+    if data is None:
+        columnas, filas, claves = construir_indice(archivoExcel)
+        escribir_indice(ruta, firma, columnas, filas, claves)
+        data = [decodificar_fila(columnas, filas[i]) for i in claves.get(clave_indice(nombreProyecto, namespace), [])]
+    return render_resultado(data)
+
+
+# ========== USO COMO BIBLIOTECA ==========
+# Importar data no lee sys.argv ni toca el CSV. Cada CatalogoProyectos es un estado
+# independiente (índice en memoria de un CSV) y se recarga solo si el CSV cambia:
+#   catalogo = data.CatalogoProyectos('proyectos.csv')
+#   catalogo.buscar('miApp', 'mi-namespace-dev')    filas como dicts (render_resultado las imprime)
+#   catalogo.buscar_namespace('mi-namespace-dev')   filas de todas las apps del namespace
+#   catalogo.buscar_prefijo('mi')                   filas de las apps cuyo appName empieza con 'mi'
+#   catalogo.namespaces('miApp')                    [{appName, NameSpaceDev, ..., NameSpaceDrs}]
+#   data.find_project('miApp', 'mi-namespace-dev')  filas como dicts; [] si no hay datos
+# find_project reutiliza un catálogo por archivo, así que las llamadas repetidas de un
+# proceso (tests, un servicio web) no vuelven a leer el índice.
+
+class CatalogoProyectos:
+    def __init__(self, archivoExcel):
+        self.archivoExcel = archivoExcel
+        self._indice = IndiceProyectos(archivoExcel)
+        self.recarga = threading.Lock()
+
+    def indice(self):
+        # Antes de cada consulta se compara la firma del CSV (un stat)
+        try:
+            firma = firma_csv(self.archivoExcel)
+        except OSError:
+            return self._indice  # CSV reemplazándose: se sigue con el índice anterior
+        if firma != self._indice.firma:
+            with self.recarga:
+                if firma != self._indice.firma:
+                    print(f"{self.archivoExcel} cambió, recargando índice", file=sys.stderr)
+                    self._indice = IndiceProyectos(self.archivoExcel)
+        return self._indice
+
+    def buscar(self, nombreProyecto, namespace):
+        return self.indice().buscar(nombreProyecto, namespace)
+
+    def buscar_namespace(self, namespace):
+        return self.indice().buscar_namespace(namespace)
+
+    def buscar_prefijo(self, prefijo):
+        return self.indice().buscar_prefijo(prefijo)
+
+    def namespaces(self, nombreProyecto):
+        return self.indice().namespaces(nombreProyecto)
+
 
-            # Validar que el proyecto coincida
-            if fila_limpia.get('appName') == nombreProyecto:
-                # Revisar si el namespace está en alguna de las columnas (si no existe la columna, ignora)
-                if any(namespace == fila_limpia.get(col, "") for col in ["NameSpaceDev", "NameSpaceUat", "NameSpacePrd", "NameSpaceDrs"]):
-                    data.append(fila_limpia)
+_catalogos = {}
+_catalogos_lock = threading.Lock()
 
-    if data:
-        return json.dumps(data, ensure_ascii=False, indent=4)
+
+def catalogo_proyectos(archivoExcel=archivo_csv):
+    clave = os.path.abspath(archivoExcel)
+    catalogo = _catalogos.get(clave)
+    if catalogo is None:
+        with _catalogos_lock:
+            catalogo = _catalogos.get(clave)
+            if catalogo is None:
+                catalogo = _catalogos[clave] = CatalogoProyectos(archivoExcel)
+    return catalogo
+
+
+def find_project(nombreProyecto, namespace, archivoExcel=archivo_csv):
+    return catalogo_proyectos(archivoExcel).buscar(nombreProyecto, namespace)
+
+
+# ========== MODO BATCH (--batch) ==========
+# Una consulta por línea en NDJSON, desde un archivo o stdin:
+#   {"nombreProyecto": "miApp", "namespace": "mi-namespace-dev"}   o   ["miApp", "mi-namespace-dev"]
+# y una línea de respuesta por consulta, en el mismo orden, con la misma semántica de No_Data:
+#   {"nombreProyecto": "miApp", "namespace": "mi-namespace-dev", "resultado": [...] | "No_Data"}
+
+def leer_consulta(linea):
+    consulta = json.loads(linea)
+    if isinstance(consulta, dict):
+        nombreProyecto, namespace = consulta['nombreProyecto'], consulta['namespace']
+    elif isinstance(consulta, list) and len(consulta) == 2:
+        nombreProyecto, namespace = consulta
     else:
-        return "No_Data"
+        raise ValueError('se esperaba {"nombreProyecto": ..., "namespace": ...} o ["nombreProyecto", "namespace"]')
+    if not isinstance(nombreProyecto, str) or not isinstance(namespace, str):
+        raise ValueError("nombreProyecto y namespace deben ser textos")
+    return nombreProyecto, namespace
+
+
+def consultar_batch(entrada, salida, archivoExcel):
+    indice = IndiceProyectos(archivoExcel)
+    for numero, linea in enumerate(entrada, 1):
+        if not linea.strip():
+            continue
+        try:
+            nombreProyecto, namespace = leer_consulta(linea)
+        except (ValueError, KeyError, TypeError) as e:
+            salida.write(json.dumps({'linea': numero, 'error': f"Consulta inválida: {e}"}, ensure_ascii=False) + '\n')
+            salida.flush()
+            continue
+        filas = indice.buscar(nombreProyecto, namespace)
+        resultado = filas if filas else "No_Data"
+        salida.write(json.dumps({'nombreProyecto': nombreProyecto, 'namespace': namespace, 'resultado': resultado},
+                                ensure_ascii=False) + '\n')
+        salida.flush()
+
+
+# ========== DAEMON (--serve) ==========
+# Mantiene el índice en memoria y responde por un socket Unix. Protocolo: una consulta
+# por línea (mismo formato que --batch) y, por cada una, una línea con el texto que
+# imprimiría data.py codificado como string JSON. Una conexión puede enviar varias
+# consultas. Antes de cada consulta se compara la firma del CSV (un stat) y, si cambió,
+# se recarga el índice sin cortar las conexiones abiertas. El cliente es data_client.py.
+
+# El socket por defecto va en una carpeta del usuario: $XDG_RUNTIME_DIR (0700 por
+# definición) o <tmp>/buscarProyecto-<uid>, que el daemon crea con 0700. Con un nombre fijo
+# en el tmp compartido, otro usuario del agente podría crear el socket antes.
+
+def socket_por_defecto():
+    carpeta = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f"buscarProyecto-{os.getuid()}")
+    return os.path.join(carpeta, 'buscarProyecto.sock')
+
+
+SOCKET_PATH = os.environ.get('BUSCAR_PROYECTO_SOCKET') or socket_por_defecto()
+
+
+def preparar_carpeta_socket(socket_path):
+    # La carpeta por defecto tiene que ser del usuario y cerrada para los demás
+    carpeta = os.path.dirname(socket_path)
+    try:
+        os.mkdir(carpeta, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(carpeta)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise SystemExit(f"{carpeta} no es una carpeta propia con permisos 0700: no se usa para el socket "
+                         f"(usar --serve con otra ruta)")
+
+
+class ServidorProyectos(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, archivoExcel):
+        self.catalogo = CatalogoProyectos(archivoExcel)
+        super().__init__(socket_path, ManejadorConsultas)
+
+
+class ManejadorConsultas(socketserver.StreamRequestHandler):
+    def handle(self):
+        for linea in self.rfile:
+            try:
+                nombreProyecto, namespace = leer_consulta(linea)
+                respuesta = render_resultado(self.server.catalogo.buscar(nombreProyecto, namespace))
+            except (ValueError, KeyError, TypeError) as e:
+                respuesta = f"Consulta inválida: {e}"
+            self.wfile.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+def servir(socket_path, archivoExcel):
+    if socket_path == socket_por_defecto():
+        preparar_carpeta_socket(socket_path)
+    if os.path.lexists(socket_path) and os.lstat(socket_path).st_uid != os.getuid():
+        raise SystemExit(f"{socket_path} pertenece a otro usuario (usar --serve con otra ruta)")
+    if os.path.exists(socket_path):
+        # Un socket que ya no acepta conexiones quedó de una corrida anterior
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            try:
+                s.connect(socket_path)
+                raise SystemExit(f"Ya hay un daemon escuchando en {socket_path}")
+            except ConnectionRefusedError:
+                os.unlink(socket_path)
+    servidor = ServidorProyectos(socket_path, archivoExcel)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Escuchando en {socket_path} ({len(servidor.catalogo.indice().filas)} filas de {archivoExcel})", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f'Busca un proyecto por appName y namespace en {archivo_csv}')
+    parser.add_argument('nombreProyecto', nargs='?')
+    parser.add_argument('namespace', nargs='?')  # <-- nuevo parámetro
+    consultas = parser.add_mutually_exclusive_group()
+    consultas.add_argument('--en-namespace', metavar='NAMESPACE',
+                           help='Filas de todas las apps con NAMESPACE en alguna columna NameSpace*')
+    consultas.add_argument('--prefijo', metavar='PREFIJO', help='Filas de las apps cuyo appName empieza con PREFIJO')
+    consultas.add_argument('--namespaces', metavar='APPNAME',
+                           help='Namespaces Dev/Uat/Prd/Drs de cada fila de APPNAME')
+    parser.add_argument('--batch', nargs='?', const='-', metavar='ARCHIVO',
+                        help='Leer consultas NDJSON desde ARCHIVO (o stdin si se omite) y responder una por línea')
+    parser.add_argument('--serve', nargs='?', const=SOCKET_PATH, metavar='SOCKET',
+                        help=f'Quedar como daemon respondiendo consultas por un socket Unix (por defecto {SOCKET_PATH})')
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        servir(args.serve, archivo_csv)
+        return
+
+    if args.batch is not None:
+        if args.batch == '-':
+            consultar_batch(sys.stdin, sys.stdout, archivo_csv)
+        else:
+            with open(args.batch, 'r', encoding='utf-8') as entrada:
+                consultar_batch(entrada, sys.stdout, archivo_csv)
+        return
+
+    if args.en_namespace is not None:
+        print(render_resultado(IndiceProyectos(archivo_csv).buscar_namespace(args.en_namespace)))
+        return
+    if args.prefijo is not None:
+        print(render_resultado(IndiceProyectos(archivo_csv).buscar_prefijo(args.prefijo)))
+        return
+    if args.namespaces is not None:
+        resultado = IndiceProyectos(archivo_csv).namespaces(args.namespaces)
+        print(json.dumps(resultado, ensure_ascii=False, indent=4) if resultado else "No_Data")
+        return
+    if args.namespace is None:
+        parser.error('se requieren nombreProyecto y namespace (o --batch / --serve / --en-namespace / '
+                     '--prefijo / --namespaces)')
+
+    # Parámetros desde la línea de comandos
+    resultadoJson = buscarProyecto(args.nombreProyecto, args.namespace, archivo_csv)
+    print(resultadoJson)
 
 
-# Parámetros desde la línea de comandos
-nombreProyecto = sys.argv[1]
-namespace = sys.argv[2]   # <-- nuevo parámetro
-resultadoJson = buscarProyecto(nombreProyecto, namespace, archivo_csv)
-print(resultadoJson)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+# Cliente mínimo del daemon de data.py (python data.py --serve). Imprime lo mismo que
+#   python data.py <nombreProyecto> <namespace>
+# y, si el daemon no está corriendo, hace la búsqueda local con data.buscarProyecto.
+# Importa solo lo indispensable para que el arranque sea lo más corto posible.
+
+# Mismo valor que data.SOCKET_PATH; se puede cambiar con BUSCAR_PROYECTO_SOCKET
+SOCKET_PATH = os.environ.get('BUSCAR_PROYECTO_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f"buscarProyecto-{os.getuid()}"),
+    'buscarProyecto.sock')
+
+
+def verificar_socket(socket_path):
+    # Solo se confía en un socket del mismo usuario: uno creado por otro podría responder cualquier cosa
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{socket_path} no es un socket del usuario actual")
+
+
+def consultar(nombreProyecto, namespace, socket_path=SOCKET_PATH):
+    verificar_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps([nombreProyecto, namespace]).encode('utf-8') + b'\n')
+        respuesta = b''
+        while not respuesta.endswith(b'\n'):
+            bloque = s.recv(1 << 16)
+            if not bloque:
+                break
+            respuesta += bloque
+    return json.loads(respuesta)
+
+
+def main():
+    if len(sys.argv) != 3:
+        raise SystemExit(f"Uso: {sys.argv[0]} <nombreProyecto> <namespace>")
+    nombreProyecto, namespace = sys.argv[1], sys.argv[2]
+    try:
+        print(consultar(nombreProyecto, namespace))
+    except (FileNotFoundError, ConnectionRefusedError, PermissionError) as e:
+        if isinstance(e, PermissionError):
+            print(f"⚠️ {e}: se busca sin el daemon", file=sys.stderr)
+        import data
+        print(data.buscarProyecto(nombreProyecto, namespace, data.archivo_csv))
+
+
+if __name__ == '__main__':
+    main()
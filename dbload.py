@@ -0,0 +1,176 @@
+import io
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from schema import CREATE_TABLE_RE, SCHEMA_FILE, SchemaRegistry, strip_sql_comments
+
+# Carga directa de las tablas normalizadas en la base definida por modelo.sql,
+# sin pasar por los CSVs. Las tablas se insertan en orden de dependencias
+# (REFERENCES) dentro de una sola transacción: las tablas que falten se crean con los
+# CREATE TABLE de modelo.sql (sin sus DROP TABLE), se vacían solo las tablas que se
+# cargan, de hijas a padres, y se insertan las filas nuevas. Las tablas que el pipeline
+# no llena (person_in_charge, runtime_directory, ...) conservan sus filas, permisos e
+# índices. Si algo falla, la base queda como estaba.
+#   sqlite:///catalogo.db           -> SQLite local (sirve para probar la carga)
+#   postgresql://user@host/base     -> PostgreSQL con COPY (requiere psycopg2)
+
+# Filas por llamada a executemany
+BATCH_SIZE = 5000
+
+
+# ========== ESQUEMA (modelo.sql) ==========
+
+def sqlite_ddl(sql_text):
+    return re.sub(r'\bSERIAL PRIMARY KEY\b', 'INTEGER PRIMARY KEY', sql_text, flags=re.I)
+
+
+def create_missing_ddl(sql_text):
+    # Los CREATE TABLE de modelo.sql como CREATE TABLE IF NOT EXISTS, en el orden del archivo
+    return '\n'.join(f"CREATE TABLE IF NOT EXISTS {table} ({body});"
+                     for table, body in CREATE_TABLE_RE.findall(strip_sql_comments(sql_text)))
+
+
+# ========== CONVERSIÓN DE VALORES ==========
+
+def db_value(value, column_type):
+    # '' en columnas no texto (ids, enteros, booleanos) es NULL; dicts y listas se guardan como en el CSV
+    if value is None:
+        return None
+    if value == '' and column_type not in ('TEXT', 'VARCHAR'):
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def copy_text(value):
+    # Formato text de COPY: \N es NULL y se escapan barra invertida, tab y saltos de línea
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+# ========== CONEXIONES ==========
+
+def connect(dsn):
+    if dsn.startswith('sqlite://'):
+        path = dsn[len('sqlite:///'):] if dsn.startswith('sqlite:///') else dsn[len('sqlite://'):]
+        # Sin transacciones implícitas: la transacción la abre y cierra DatabaseLoader.commit
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('PRAGMA foreign_keys = ON')
+        return 'sqlite', conn
+    if dsn.startswith(('postgresql://', 'postgres://')):
+        try:
+            import psycopg2
+        except ImportError:
+            raise SystemExit("Para cargar en PostgreSQL se necesita psycopg2 (pip install psycopg2-binary)")
+        return 'postgresql', psycopg2.connect(dsn)
+    raise ValueError(f"DSN no soportado: {dsn} (usar sqlite:///archivo.db o postgresql://...)")
+
+
+class DatabaseLoader:
+    # Misma interfaz que OutputStage de jsontocsv.py: cada tabla se entrega una vez
+    # con write_table y todo se inserta en commit(). No tiene stream_table: check_options
+    # rechaza --load-db con --stream.
+    def __init__(self, dsn, schema_file=SCHEMA_FILE):
+        self.dsn = dsn
+        self.sql_text = Path(schema_file).read_text(encoding='utf-8')
+        self.schema = SchemaRegistry.parse(self.sql_text)
+        self.tables = {}
+
+    def write_table(self, filename, headers, rows):
+        self.write_rows(filename, headers, [tuple(row.get(h) for h in headers) for row in rows])
+
+    def write_rows(self, filename, headers, rows):
+        # Filas como tuplas en el orden de headers
+        table = Path(filename).stem
+        if table in self.tables:
+            raise ValueError(f"La tabla {table} ya fue entregada en esta corrida")
+        self.tables[table] = (headers, rows)
+
+    def _columns(self, table, headers):
+        # [(posición en la fila, columna, tipo)] de las columnas que existen en modelo.sql
+        columns = self.schema[table]['columns']
+        skipped = [h for h in headers if h not in columns]
+        if skipped:
+            print(f"⚠️ {table}: columnas sin equivalente en modelo.sql omitidas: {', '.join(skipped)}")
+        return [(i, h, columns[h]) for i, h in enumerate(headers) if h in columns]
+
+    def _load_sqlite(self, conn, table, columns, rows):
+        names = [name for _, name, _ in columns]
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        for start in range(0, len(rows), BATCH_SIZE):
+            conn.executemany(sql, [
+                tuple(db_value(row[i], t) for i, _, t in columns)
+                for row in rows[start:start + BATCH_SIZE]
+            ])
+
+    def _load_postgresql(self, cursor, table, columns, rows):
+        names = [name for _, name, _ in columns]
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_text(db_value(row[i], t)) for i, _, t in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(names)}) FROM STDIN", buffer)
+        if 'id' in names:
+            # Las secuencias SERIAL quedan después del último id cargado
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                           f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+
+    def commit(self):
+        unknown = [t for t in self.tables if t not in self.schema]
+        for table in unknown:
+            print(f"⚠️ La tabla {table} no existe en modelo.sql, se omite")
+        kind, conn = connect(self.dsn)
+        start = time.perf_counter()
+        total = 0
+        try:
+            ddl = create_missing_ddl(self.sql_text)
+            if kind == 'sqlite':
+                conn.executescript('BEGIN;\n' + sqlite_ddl(ddl))
+            else:
+                cursor = conn.cursor()
+                cursor.execute(ddl)
+            # Se vacían solo las tablas que se cargan, de hijas a padres
+            for table in reversed(self.schema.order):
+                if table in self.tables:
+                    if kind == 'sqlite':
+                        conn.execute(f"DELETE FROM {table}")
+                    else:
+                        cursor.execute(f"DELETE FROM {table}")
+            for table in self.schema.order:
+                if table not in self.tables:
+                    continue
+                headers, rows = self.tables[table]
+                columns = self._columns(table, headers)
+                if kind == 'sqlite':
+                    self._load_sqlite(conn, table, columns, rows)
+                else:
+                    self._load_postgresql(cursor, table, columns, rows)
+                total += len(rows)
+            if kind == 'sqlite':
+                conn.execute('COMMIT')
+            else:
+                conn.commit()
+        except BaseException:
+            if kind == 'sqlite':
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            else:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+        print(f"Cargadas {total} filas en {len(self.tables) - len(unknown)} tablas ({time.perf_counter() - start:.2f}s)")
+
+    def abort(self):
+        self.tables = {}
+
+    def table_stats(self):
+        return {table: {'rows': len(rows)} for table, (_, rows) in self.tables.items()}
@@ -0,0 +1,176 @@
+import csv
+import re
+from pathlib import Path
+
+from schema import SCHEMA_FILE, load_schema
+
+# Modo --delta de jsontocsv.py: en lugar de recargar todo el catálogo, se compara la
+# corrida nueva con la foto anterior de csv_output y se escriben solo los cambios.
+# Para que comparar por id sea comparar por clave natural, los ids se conservan entre
+# corridas: cada valor (proyecto, appName, ambiente, url del repo, ...) que ya estaba en
+# la foto anterior recibe el mismo id, y los nuevos toman ids por encima del máximo
+# anterior. Salida, por tabla con cambios:
+#   <tabla>.insert.csv / <tabla>.update.csv   filas completas
+#   <tabla>.delete.csv                        solo el id
+# y upsert.sql con todos los cambios en una transacción (INSERT ... ON CONFLICT (id)
+# DO UPDATE en orden de dependencias y luego los DELETE en orden inverso).
+
+# Filas por sentencia INSERT / DELETE en upsert.sql
+SQL_BATCH_SIZE = 1000
+
+NUMERIC_TYPES = ('INT', 'INTEGER', 'SMALLINT', 'BIGINT', 'SERIAL', 'BIGSERIAL', 'NUMERIC', 'DECIMAL', 'REAL', 'FLOAT')
+NUMBER_RE = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+# ========== FOTO ANTERIOR ==========
+
+def read_snapshot(folder):
+    # tabla -> (encabezados, {id: fila}) de cada CSV con columna id; filas como tuplas de texto
+    snapshot = {}
+    folder = Path(folder)
+    if not folder.is_dir():
+        return snapshot
+    for path in sorted(folder.glob('*.csv')):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            if not headers or headers[0] != 'id':
+                continue
+            snapshot[path.stem] = (headers, {int(row[0]): tuple(row) for row in reader if row and row[0]})
+    return snapshot
+
+
+def column_index(snapshot, table, columns):
+    headers, rows = snapshot.get(table, ([], {}))
+    if not all(c in headers for c in columns):
+        return [], {}
+    return [headers.index(c) for c in columns], rows
+
+
+def group_ids(pairs):
+    # [(clave, id)] -> {clave: [ids ascendentes]}
+    grouped = {}
+    for key, id_ in sorted(pairs, key=lambda p: p[1]):
+        grouped.setdefault(key, []).append(id_)
+    return grouped
+
+
+def previous_ids(snapshot, dimensions):
+    # Claves naturales -> ids de la foto anterior: por tabla de cada Dimension con
+    # key_columns, más 'microservice', 'general', 'drs' y 'token'
+    previous = {}
+    for table, dimension in dimensions.items():
+        if not dimension.key_columns:
+            continue
+        positions, rows = column_index(snapshot, table, dimension.key_columns)
+        if len(positions) == 1:
+            previous[table] = group_ids((row[positions[0]], id_) for id_, row in rows.items())
+        else:
+            previous[table] = group_ids((tuple(row[p] for p in positions), id_) for id_, row in rows.items())
+
+    positions, rows = column_index(snapshot, 'token_directory', ('token_name',))
+    previous['token'] = group_ids((row[positions[0]], id_) for id_, row in rows.items()) if positions else {}
+
+    # Microservicios por (proyecto, appName, ambiente), resueltos desde app_general_properties
+    def names(table, column):
+        positions, rows = column_index(snapshot, table, (column,))
+        return {str(id_): row[positions[0]] for id_, row in rows.items()} if positions else {}
+    projects = names('project_directory', 'project_name')
+    apps = names('appname_directory', 'app')
+    envs = names('env_directory', 'env')
+    app_dirs = names('app_directory', 'id_appname')
+    columns = ('id_microservice_directory', 'id_project_directory', 'id_app_directory', 'id_env_directory')
+    positions, rows = column_index(snapshot, 'app_general_properties', columns)
+    ms_keys, general_keys = {}, []
+    for id_, row in rows.items() if positions else ():
+        ms_id, project_id, app_dir_id, env_id = (row[p] for p in positions)
+        if not ms_id:
+            continue
+        key = (projects.get(project_id, ''), apps.get(app_dirs.get(app_dir_id), ''), envs.get(env_id, ''))
+        ms_keys[int(ms_id)] = key
+        general_keys.append((ms_id, id_))
+    previous['microservice'] = group_ids((key, ms_id) for ms_id, key in ms_keys.items())
+    previous['general'] = group_ids(general_keys)
+
+    # microservice_drs_config por el microservicio master que lo referencia
+    positions, rows = column_index(snapshot, 'microservice_properties_directory', ('id_drs_config',))
+    previous['drs'] = group_ids(
+        (str(id_), int(row[positions[0]])) for id_, row in rows.items() if row[positions[0]]
+    ) if positions else {}
+    return previous
+
+
+# ========== DIFERENCIAS ==========
+
+def diff_tables(previous, current):
+    # tabla -> (encabezados, inserts, updates, ids borrados) solo de las tablas con cambios
+    changes = {}
+    for table in sorted(set(previous) | set(current)):
+        old_headers, old_rows = previous.get(table, (None, {}))
+        headers, rows = current.get(table, (old_headers, {}))
+        inserts = [row for id_, row in rows.items() if id_ not in old_rows]
+        updates = [row for id_, row in rows.items() if id_ in old_rows and old_rows[id_] != row]
+        deletes = sorted(id_ for id_ in old_rows if id_ not in rows)
+        if inserts or updates or deletes:
+            changes[table] = (headers, inserts, updates, deletes)
+    return changes
+
+
+def sql_literal(value, column_type):
+    # Mismo criterio que dbload.db_value: '' en columnas no texto es NULL
+    if value == '' and column_type not in ('TEXT', 'VARCHAR'):
+        return 'NULL'
+    if column_type == 'BOOLEAN' and value in ('True', 'False'):
+        return value.upper()
+    if column_type in NUMERIC_TYPES and NUMBER_RE.match(value):
+        return value
+    return "'" + value.replace("'", "''") + "'"
+
+
+def upsert_sql(changes, schema, dialect='postgresql'):
+    # schema: SchemaRegistry
+    lines = ['BEGIN;']
+    order = [t for t in schema.order if t in changes]
+    for table in order:
+        headers, inserts, updates, _ = changes[table]
+        table_columns = schema[table]['columns']
+        columns = [(i, h, table_columns[h]) for i, h in enumerate(headers) if h in table_columns]
+        names = [name for _, name, _ in columns]
+        rows = inserts + updates
+        for start in range(0, len(rows), SQL_BATCH_SIZE):
+            values = ',\n'.join(
+                '(' + ', '.join(sql_literal(row[i], t) for i, _, t in columns) + ')'
+                for row in rows[start:start + SQL_BATCH_SIZE]
+            )
+            assignments = ', '.join(f"{n} = EXCLUDED.{n}" for n in names if n != 'id')
+            lines.append(f"INSERT INTO {table} ({', '.join(names)}) VALUES\n{values}\n"
+                         f"ON CONFLICT (id) DO UPDATE SET {assignments};")
+        if inserts and dialect == 'postgresql':
+            lines.append(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                         f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false);")
+    # Los borrados al final y de hijas a padres: ninguna fila nueva apunta a una borrada
+    for table in reversed(order):
+        deletes = changes[table][3]
+        for start in range(0, len(deletes), SQL_BATCH_SIZE):
+            ids = ', '.join(str(i) for i in deletes[start:start + SQL_BATCH_SIZE])
+            lines.append(f"DELETE FROM {table} WHERE id IN ({ids});")
+    lines.append('COMMIT;')
+    return '\n'.join(lines) + '\n'
+
+
+def write_delta(output, previous, current, schema_file=SCHEMA_FILE):
+    # Escribe los CSVs de cambios y upsert.sql en output (OutputStage); devuelve los cambios
+    changes = diff_tables(previous, current)
+    for table, (headers, inserts, updates, deletes) in changes.items():
+        if inserts:
+            output.write_rows(f"{table}.insert.csv", headers, inserts)
+        if updates:
+            output.write_rows(f"{table}.update.csv", headers, updates)
+        if deletes:
+            output.write_rows(f"{table}.delete.csv", ['id'], [(i,) for i in deletes])
+    schema = load_schema(schema_file)
+    skipped = [t for t in changes if t not in schema]
+    if skipped:
+        print(f"⚠️ Tablas sin equivalente en modelo.sql, fuera de upsert.sql: {', '.join(skipped)}")
+    output.write_text('upsert.sql', upsert_sql({t: c for t, c in changes.items() if t in schema}, schema))
+    return changes
@@ -0,0 +1,74 @@
+import sys
+
+from schema import tuple_projector
+
+# Tablas de dimensión (*_directory) en memoria: cada valor distinto recibe un id la
+# primera vez que aparece y se guarda una sola vez. Búsqueda valor -> id en O(1); las
+# claves compuestas (app_directory: (id_appname, repo_url)) son tuplas.
+# La tabla completa se exporta de una vez con write_rows de cualquier salida
+# (OutputStage, DatabaseLoader).
+
+
+def csv_text(value):
+    # Un valor (o tupla de valores) tal como queda escrito en el CSV
+    if isinstance(value, tuple):
+        return tuple(csv_text(v) for v in value)
+    return '' if value is None else str(value)
+
+
+class IdAllocator:
+    # Ids consecutivos desde 1, salvo que haya ids de una foto anterior (--delta): una
+    # clave natural que ya tenía id lo conserva y las nuevas siguen después del máximo.
+    # previous: clave natural -> [ids] en orden; una clave con varios ids (el mismo
+    # proyecto/app/ambiente en dos archivos) los reparte en el orden en que se asignaron.
+    def __init__(self, previous=None, key=csv_text):
+        self.previous = previous or {}
+        self.key = key
+        self.taken = set()
+        self.next_id = max((i for ids in self.previous.values() for i in ids), default=0) + 1
+
+    def allocate(self, value):
+        for id_ in self.previous.get(self.key(value), ()) if self.previous else ():
+            if id_ not in self.taken:
+                break
+        else:
+            id_ = self.next_id
+            self.next_id += 1
+        self.taken.add(id_)
+        return id_
+
+
+class Dimension(dict):
+    # dict valor -> id: dimension[valor] devuelve el id y, si el valor es nuevo, lo crea
+    # (__missing__), así la búsqueda del caso común es un acceso a dict sin llamadas en Python
+    def __init__(self, table, headers=None, key_columns=None, row=None, allocator=None):
+        super().__init__()
+        self.table = table
+        self.headers = headers  # None: solo asigna ids, no se exporta (microservicios)
+        self.key_columns = key_columns  # columnas del CSV que forman la clave natural
+        self.row = row  # (id, valor) -> tupla en el orden de headers (columnas derivadas, app_directory)
+        self.allocator = allocator
+
+    def __missing__(self, value):
+        if type(value) is str:
+            value = sys.intern(value)
+        id_ = self.allocator.allocate(value) if self.allocator is not None else len(self) + 1
+        self[value] = id_
+        return id_
+
+    def keep_ids(self, previous, key=csv_text):
+        # Modo --delta; se llama antes de asignar el primer id
+        self.allocator = IdAllocator(previous, key)
+
+    def rows(self):
+        # Filas en el orden en que aparecieron los valores; sin row, el id y la clave van a
+        # sus columnas de headers y el resto queda vacío
+        if self.row is not None:
+            return [self.row(id_, value) for value, id_ in self.items()]
+        project = tuple_projector(self.headers, ('id',) + tuple(self.key_columns))
+        if len(self.key_columns) == 1:
+            return [project((id_, value)) for value, id_ in self.items()]
+        return [project((id_,) + value) for value, id_ in self.items()]
+
+    def export(self, output):
+        output.write_rows(f"{self.table}.csv", self.headers, self.rows())
@@ -0,0 +1,66 @@
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    orjson = None
+
+# Capa de parseo JSON de jsontocsv.py: los exports por país, el 'config' anidado de cada
+# microservicio y token.json pasan por loads() / load_file() de este módulo.
+#   json    biblioteca estándar
+#   orjson  si está instalado (por defecto); acepta bytes y memoryview, así que los
+#           archivos se parsean directo desde un mmap sin decodificar a str ni copiar.
+# Lo que orjson rechaza y json acepta (NaN, Infinity, surrogates sueltos) se vuelve a
+# parsear con json, así que los errores son los mismos con cualquier backend. Única
+# diferencia: orjson lee los enteros de más de 64 bits como float. El modo --stream
+# sigue con json.JSONDecoder.raw_decode, que es lo que permite leer el archivo por partes.
+
+BACKENDS = ('json', 'orjson')
+DEFAULT_BACKEND = 'orjson' if orjson is not None else 'json'
+
+_backend = DEFAULT_BACKEND
+
+
+def use_backend(name):
+    # 'auto' o None: orjson si está instalado
+    global _backend
+    if name in (None, 'auto'):
+        name = DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Backend JSON desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("El backend orjson requiere orjson (pip install orjson)")
+    _backend = name
+    return name
+
+
+def current_backend():
+    return _backend
+
+
+def loads(data):
+    # data: str, bytes o memoryview
+    if _backend == 'orjson':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    if not isinstance(data, str):
+        # Igual que leer el archivo en modo texto: UTF-8 estricto, un BOM es un error de json
+        data = bytes(data).decode('utf-8')
+    return json.loads(data)
+
+
+def load_file(path):
+    # El archivo se mapea en memoria y se parsea como bytes
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return loads(b'')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return loads(view)
+            finally:
+                view.release()
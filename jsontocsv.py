@@ -1,788 +1,1580 @@
+import argparse
+import cProfile
+import hashlib
+import io
 import os
 import json
 import csv
+import gzip
+import pickle
+import pstats
+import shutil
+import stat
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from itertools import product
 
+from dbload import DatabaseLoader
+from delta import previous_ids, read_snapshot, write_delta
+from dimensions import Dimension, IdAllocator, csv_text
+from jsonbackend import BACKENDS, current_backend, load_file, loads, use_backend
+from quotas import QuotaColumns, write_capacity_tables
+from records import GeneralRow, MicroserviceRecord, MicroserviceRow
+from schema import load_schema
+from sources import SourceCatalog
+
 # Carpeta donde se guardarán los CSVs
 csv_folder = Path('csv_output')
-csv_folder.mkdir(exist_ok=True)
 
 json_folder = Path('.')
 token_file = Path('token.json')
+# Manifiesto y filas aplanadas cacheadas del modo --incremental
+cache_folder = Path('.jsontocsv_cache')
 
-# ========== BOOTSTRAP: Crear CSVs requeridos si no existen (excepto catálogos estáticos) ==========
-# Definir los encabezados mínimos para los CSVs requeridos
-bootstrap_csvs = {
-    'token_directory.csv': ['id', 'token', 'token_name', 'namespace_name'],
-    'usage_directory.csv': ['id', 'usage'],
-    'image_directory.csv': ['id', 'image_name'],
-    'path_directory.csv': ['id', 'volume_path'],
-    'project_directory.csv': ['id', 'project_name', 'project_acronym'],
-    'appname_directory.csv': ['id', 'app'],
-    'app_directory.csv': ['id', 'id_appname', 'repo_name', 'repo_url'],
-    'env_directory.csv': ['id', 'env', 'reponexus'],
-    'country_directory.csv': ['id', 'country'],
-    'label_directory.csv': ['id', 'app_label'],
-    'app_type_directory.csv': ['id', 'app_type'],
-    'runtime_directory.csv': ['id', 'runtime_name', 'version_path'],
-    'person_in_charge.csv': ['id', 'nombre', 'email'],
-    'security_champion.csv': ['id', 'nombre', 'email'],
-    'microservice_properties_directory.csv': ['id','id_usage_directory','cpulimits','cpurequest','memorylimits','memoryrequest','replicas','id_token_directory','id_openshift_properties_directory','id_path_directory','id_image_directory','id_drs_config'],
-    'microservice_drs_config.csv': ['id', 'drs_enabled', 'drs_token', 'drs_namespace'],
-    'app_general_properties.csv': ['id','id_project_directory','id_app_directory','id_person_in_charge','id_security_champion','id_env_directory','id_country_directory','id_label_directory','id_app_type_directory','id_pipeline_properties_directory','id_pipeline_general_properties_directory','id_runtime_directory','sonarqubepath_exec','id_microservice_directory','id_datastage_properties_directory','id_database_properties_directory','id_was_properties_directory','id_pims_properties_directory','project_name','appName','repositoryUrl','buildConfigurationMode','env','country','ocpLabel','project','baseImageVersion'],
-    'datastage_properties_directory.csv': ['id'],
-    'database_properties_directory.csv': ['id'],
-    'was_properties_directory.csv': ['id', 'host', 'instance_name', 'context_root'],
-    'pims_properties_directory.csv': ['id', 'nexus_url'],
-}
-for fname, headers in bootstrap_csvs.items():
-    fpath = csv_folder / fname
-    if not fpath.exists():
-        with open(fpath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-
-# Cargar tokens (nuevo formato: lista de objetos)
-with open(token_file, 'r', encoding='utf-8') as f:
-    token_list = json.load(f)
-    # Crear un dict para búsqueda rápida por tokenname
-    token_map = {t['tokenname']: t for t in token_list}
-
-# ========== AJUSTE: Poblar usage_directory.csv con todos los status únicos de token.json ==========
-usage_set = set(t['status'] for t in token_list)
-usage_id_map = {}
-usage_rows = []
-for idx, usage in enumerate(sorted(usage_set), 1):
-    usage_id_map[usage] = idx
-    usage_rows.append({'id': idx, 'usage': usage})
-with open(csv_folder / 'usage_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'usage'])
-    writer.writeheader()
-    writer.writerows(usage_rows)
-
-general_rows = []
-microservice_rows = []
-ms_id_counter = 1
-ms_id_map = {}  # (source_file, project_name, appName, env) -> id
-
-# Diccionarios para mapear valores a IDs únicos por tabla
-project_id_map = {}
-appname_id_map = {}
-app_dir_id_map = {}
-env_id_map = {}
-country_id_map = {}
-label_id_map = {}
-usage_id_map = {}
-token_id_map = {}
-path_id_map = {}
-
-project_counter = appname_counter = app_dir_counter = env_counter = country_counter = label_counter = usage_counter = path_counter = 1
-
-def get_token_key(token_name, env):
-    if env == 'dev':
-        token_env = 'dev'
-    elif env == 'qa':
-        token_env = 'uat'
-    elif env == 'master':
-        token_env = 'prd'
-    token_env_name = f"{token_name}{token_env}"
-    for k in token_map.keys():
-        if k.lower() == token_env_name.lower():
-            return k, token_map[k]
-    return '', ''
-
-def get_or_create_id(mapping, value, counter_name):
-    global_vars = globals()
-    if value not in mapping:
-        mapping[value] = global_vars[counter_name]
-        global_vars[counter_name] += 1
-    return mapping[value]
-
-def get_key_insensitive(d, key):
-    for k in d.keys():
-        if k.lower() == key.lower():
-            return d[k]
-    return [] if key in ['secrets','configMaps','volumes'] else None
-
-# Construir token_id_map para búsqueda rápida de id_token_directory por tokenname
-with open(csv_folder / 'token_directory.csv', newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        token_id_map[row['token_name']] = int(row['id'])
-
-# ========== GENERAR TODAS LAS COMBINACIONES PARA openshift_properties_directory.csv ==========
-from itertools import product
-openshift_fields = ['secrets_enabled', 'configmap_enabled', 'volume_enabled']
+ENVS = ['dev', 'qa', 'master']
+
+# ========== TABLAS DEL MODELO (modelo.sql) ==========
+# Encabezados, orden de columnas y proyectores salen del registro de modelo.sql: cada
+# tabla del modelo que la corrida no genera se escribe vacía, solo con su encabezado.
+# modelo.sql se lee en la primera corrida (model_tables), no al importar el módulo.
+
+# Columnas de cuota de microservice_properties_directory. Con --quota-profiles cada
+# combinación distinta se guarda una sola vez en quota_profile_directory y
+# microservice_properties_directory la referencia por id en lugar de repetirla.
+QUOTA_COLUMNS = ('cpulimits', 'cpurequest', 'memorylimits', 'memoryrequest', 'replicas')
+
+
+class ModelTables:
+    # Columnas finales de las tablas de hechos, en el orden de modelo.sql, y sus
+    # proyectores precompilados: registro -> tupla en el orden de las columnas
+    def __init__(self, schema):
+        self.schema = schema
+        ms_table = 'microservice_properties_directory'
+        self.ms_headers = schema.columns(ms_table, exclude=('id_quota_profile_directory',))
+        self.ms_profile_headers = schema.columns(ms_table, exclude=QUOTA_COLUMNS)
+        self.app_headers = schema.columns('app_general_properties')
+        self.drs_headers = schema.columns('microservice_drs_config')
+        self.project_ms_row = schema.attr_projector(ms_table, exclude=('id_quota_profile_directory',))
+        self.project_ms_profile_row = schema.attr_projector(ms_table, exclude=QUOTA_COLUMNS)
+        self.project_general_row = schema.attr_projector('app_general_properties')
+        # (id,) + MicroserviceRecord.drs
+        self.project_drs_row = schema.tuple_projector('microservice_drs_config',
+                                                      ('id', 'drs_enabled', 'drs_token', 'drs_namespace'))
+        self.project_token_row = schema.tuple_projector('token_directory',
+                                                        ('id', 'token', 'token_name', 'namespace_name'))
+
+
+_model_tables = None
+
+
+def model_tables():
+    # Tablas del registro vigente: load_schema vuelve a parsear modelo.sql solo si cambió
+    global _model_tables
+    schema = load_schema()
+    if _model_tables is None or _model_tables.schema is not schema:
+        _model_tables = ModelTables(schema)
+    return _model_tables
+
+
+# Combinaciones posibles de (secrets_enabled, configmap_enabled, volume_enabled)
+openshift_fields = ('secrets_enabled', 'configmap_enabled', 'volume_enabled')
 openshift_combinations = list(product([True, False], repeat=3))
-openshift_rows = []
-for idx, combo in enumerate(openshift_combinations, 1):
-    row = {'id': idx}
-    for i, field in enumerate(openshift_fields):
-        row[field] = combo[i]
-    openshift_rows.append(row)
-with open(csv_folder / 'openshift_properties_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id'] + openshift_fields)
-    writer.writeheader()
-    writer.writerows(openshift_rows)
-# Leer combinaciones predefinidas de openshift_properties_directory.csv
-openshift_map = {}
-with open(csv_folder / 'openshift_properties_directory.csv', newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        key = (row['secrets_enabled'] == 'True', row['configmap_enabled'] == 'True', row['volume_enabled'] == 'True')
-        openshift_map[key] = int(row['id'])
-
-# Leer combinaciones predefinidas de pipeline_properties_directory.csv
-pipeline_map = {}
-pipeline_csv_path = csv_folder / 'pipeline_properties_directory.csv'
-if pipeline_csv_path.exists():
-    with open(pipeline_csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            key = (
-                row['securitygate'] == 'True',
-                row['unittests'] == 'True',
-                row['sonarqube'] == 'True',
-                row['qualitygate'] == 'True',
-            )
-            pipeline_map[key] = int(row['id'])
-else:
-    print('⚠️ pipeline_properties_directory.csv no existe. Debe estar predefinido.')
-
-# ========== BOOTSTRAP: Crear CSVs requeridos si no existen (excepto catálogos estáticos) ==========
-# Definir los encabezados mínimos para los CSVs requeridos
-bootstrap_csvs = {
-    'token_directory.csv': ['id', 'token', 'token_name', 'namespace_name'],
-    'usage_directory.csv': ['id', 'usage'],
-    'image_directory.csv': ['id', 'image_name'],
-    'path_directory.csv': ['id', 'volume_path'],
-    'project_directory.csv': ['id', 'project_name', 'project_acronym'],
-    'appname_directory.csv': ['id', 'app'],
-    'app_directory.csv': ['id', 'id_appname', 'repo_name', 'repo_url'],
-    'env_directory.csv': ['id', 'env', 'reponexus'],
-    'country_directory.csv': ['id', 'country'],
-    'label_directory.csv': ['id', 'app_label'],
-    'app_type_directory.csv': ['id', 'app_type'],
-    'runtime_directory.csv': ['id', 'runtime_name', 'version_path'],
-    'person_in_charge.csv': ['id', 'nombre', 'email'],
-    'security_champion.csv': ['id', 'nombre', 'email'],
-    'microservice_properties_directory.csv': ['id','id_usage_directory','cpulimits','cpurequest','memorylimits','memoryrequest','replicas','id_token_directory','id_openshift_properties_directory','id_path_directory','id_image_directory','id_drs_config'],
-    'microservice_drs_config.csv': ['id', 'drs_enabled', 'drs_token', 'drs_namespace'],
-    'app_general_properties.csv': ['id','id_project_directory','id_app_directory','id_person_in_charge','id_security_champion','id_env_directory','id_country_directory','id_label_directory','id_app_type_directory','id_pipeline_properties_directory','id_pipeline_general_properties_directory','id_runtime_directory','sonarqubepath_exec','id_microservice_directory','id_datastage_properties_directory','id_database_properties_directory','id_was_properties_directory','id_pims_properties_directory','project_name','appName','repositoryUrl','buildConfigurationMode','env','country','ocpLabel','project','baseImageVersion'],
-    'datastage_properties_directory.csv': ['id'],
-    'database_properties_directory.csv': ['id'],
-    'was_properties_directory.csv': ['id', 'host', 'instance_name', 'context_root'],
-    'pims_properties_directory.csv': ['id', 'nexus_url'],
-}
-for fname, headers in bootstrap_csvs.items():
-    fpath = csv_folder / fname
-    if not fpath.exists():
-        with open(fpath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-
-for filename in os.listdir(json_folder):
-    if filename.endswith('.json') and filename != token_file.name:
-        filepath = json_folder / filename
-        with open(filepath, 'r', encoding='utf-8') as f:
+openshift_combination_ids = {combo: idx for idx, combo in enumerate(openshift_combinations, 1)}
+
+# Combinaciones posibles de (securitygate, unittests, sonarqube, qualitygate)
+pipeline_fields = ('securitygate', 'unittests', 'sonarqube', 'qualitygate')
+pipeline_combinations = list(product([True, False], repeat=4))
+pipeline_combination_ids = {combo: idx for idx, combo in enumerate(pipeline_combinations, 1)}
+
+
+# Sufijo de token según el ambiente del microservicio
+TOKEN_ENV_SUFFIX = {'dev': 'dev', 'qa': 'uat', 'master': 'prd'}
+
+
+def derive_namespace_name(token_name):
+    # Derivar namespace_name (parte después de 'ocToken' y antes del ambiente)
+    ns = token_name.replace('ocToken', '')
+    # Quitar sufijos de ambiente comunes
+    for env in ['dev', 'uat', 'prd']:
+        if ns.lower().endswith(env):
+            ns = ns[:-(len(env))]
+    return ns if ns else ''
+
+
+class TokenResolver:
+    # Índices sobre token.json construidos una sola vez al cargar:
+    #   by_name:     tokenname exacto -> entrada
+    #   by_folded:   tokenname en minúsculas -> tokenname (primera aparición)
+    #   by_base_env: (nombre base en minúsculas, dev/uat/prd) -> tokenname
+    #   namespaces:  tokenname -> namespace_name derivado
+    def __init__(self, token_list):
+        self.by_name = {t['tokenname']: t for t in token_list}
+        self.by_folded = {}
+        self.by_base_env = {}
+        self.namespaces = {}
+        for name in self.by_name:
+            folded = name.casefold()
+            self.by_folded.setdefault(folded, name)
+            for suffix in ('dev', 'uat', 'prd'):
+                if folded.endswith(suffix):
+                    self.by_base_env.setdefault((folded[:-len(suffix)], suffix), name)
+                    break
+            self.namespaces[name] = derive_namespace_name(name)
+        # Resultado de cada resolve(): exacto, sin distinguir mayúsculas, por ambiente o sin token
+        self.counts = {'exact': 0, 'folded': 0, 'env': 0, 'missing': 0}
+
+    def lookup(self, token_name):
+        # tokenname igual a token_name sin distinguir mayúsculas/minúsculas, o None
+        return self.by_folded.get(token_name.casefold())
+
+    def resolve(self, token_name, env):
+        # tokenname de token.json para el tokenOcp de un microservicio en un ambiente: el
+        # mismo nombre, el mismo sin distinguir mayúsculas/minúsculas o el nombre base con
+        # el sufijo del ambiente (dev -> dev, qa -> uat, master -> prd). None si no hay.
+        if not isinstance(token_name, str) or not token_name:
+            self.counts['missing'] += 1
+            return None
+        if token_name in self.by_name:
+            self.counts['exact'] += 1
+            return token_name
+        name = self.lookup(token_name)
+        if name is not None:
+            self.counts['folded'] += 1
+            return name
+        name = self.by_base_env.get((token_name.casefold(), TOKEN_ENV_SUFFIX.get(env)))
+        self.counts['env' if name is not None else 'missing'] += 1
+        return name
+
+    def stats(self):
+        return dict(self.counts, entries=len(self.by_name), base_names=len(self.by_base_env))
+
+
+class MicroserviceConfig:
+    # Config de un microservicio (campo 'config' de cada ms), parseado una sola vez.
+    # Las claves se indexan en minúsculas al construir el objeto, de modo que las
+    # búsquedas insensibles a mayúsculas/minúsculas son O(1).
+    __slots__ = ('data', 'keys')
+
+    LIST_FIELDS = ('secrets', 'configmaps', 'volumes')
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self.keys = {}
+        for k in self.data:
+            self.keys.setdefault(k.casefold(), k)
+
+    @classmethod
+    def parse(cls, raw):
+        if isinstance(raw, str):
             try:
-                data = json.load(f)
-            except Exception as e:
-                print(f"⚠️ Error al leer {filename}: {e}")
+                raw = loads(raw)
+            except Exception:
+                raw = {}
+        return cls(raw)
+
+    def get(self, key):
+        folded = key.casefold()
+        k = self.keys.get(folded)
+        if k is None:
+            return [] if folded in self.LIST_FIELDS else None
+        return self.data[k]
+
+    @property
+    def app_name(self):
+        return self.data.get('appName', '')
+
+    def quota(self, env):
+        return self.get(f"resQuotas{env}")
+
+    def quotas(self):
+        # Cuotas por ambiente aplicando la herencia: si solo existe master o solo dev,
+        # se usa para los tres ambientes
+        quotas = {env: self.quota(env) for env in ('dev', 'qa', 'master')}
+        if not quotas['dev'] and not quotas['qa'] and quotas['master']:
+            quotas['dev'] = quotas['qa'] = quotas['master']
+        elif quotas['dev'] and not quotas['qa'] and not quotas['master']:
+            quotas['qa'] = quotas['master'] = quotas['dev']
+        return quotas
+
+    def quota_items(self):
+        # Primer elemento de la cuota de cada ambiente (None si el ambiente no aplica)
+        items = {}
+        for env, env_quota in self.quotas().items():
+            if env_quota:
+                items[env] = env_quota[0] if isinstance(env_quota, list) else env_quota
+            else:
+                items[env] = None
+        return items
+
+    def openshift_key(self):
+        return (
+            any(s.get('secret', False) for s in self.get('secrets')),
+            any(c.get('configMap', False) for c in self.get('configMaps')),
+            any(v.get('volume', False) for v in self.get('volumes')),
+        )
+
+    def volume_path(self):
+        # Primer mountPath de volumes (si existe)
+        volumes = self.get('volumes')
+        if volumes and isinstance(volumes, list) and len(volumes) > 0:
+            return volumes[0].get('mountPath', '')
+        return ''
+
+    def drs(self):
+        return (
+            self.data.get('drsDeployEnable', False),
+            self.data.get('drs_token', ''),
+            self.data.get('drs_namespace', ''),
+        )
+
+    def pipeline_flags(self):
+        return (
+            self.data.get('securitygate', True),
+            self.data.get('unittests', True),
+            self.data.get('sonarqube', True),
+            self.data.get('qualitygate', True),
+        )
+
+
+# ========== INGESTA: parseo y aplanado por archivo (paralelizable) ==========
+# Cada archivo <Country>-<TYPE>.json es independiente hasta la asignación de IDs,
+# así que se parsea y aplana por separado (en un pool de procesos con --workers N).
+# Los IDs se asignan después, en serie y en el orden de los archivos, por lo que
+# la salida es idéntica a la de una corrida serial.
+
+def flatten_ms(ms):
+    config = MicroserviceConfig.parse(ms.get('config', {}))
+    return MicroserviceRecord(
+        appName=config.app_name,
+        repositoryUrl=ms.get('repositoryUrl'),
+        buildConfigurationMode=ms.get('buildConfigurationMode'),
+        tokenOcp=ms.get('tokenOcp'),
+        country=config.get('country'),
+        ocpLabel=config.get('ocpLabel'),
+        usage=config.get('usage'),
+        project=config.get('project'),
+        baseImageVersion=config.get('baseImageVersion'),
+        quota_items=config.quota_items(),
+        openshift_key=config.openshift_key(),
+        volume_path=config.volume_path(),
+        drs=config.drs(),
+        pipeline_flags=config.pipeline_flags(),
+    )
+
+
+def flatten_document(data):
+    # [(project_name, [registros aplanados])] de un export ya parseado
+    projects = data.get('project') or data.get('projects') or []
+    flattened = []
+    for project in projects:
+        project_name = project.get('name', '')
+        flattened.append((project_name, [flatten_ms(ms) for ms in project.get('ms', [])]))
+    return flattened
+
+
+def parse_source(filepath):
+    # Devuelve (nombre de archivo, error, [(project_name, [registros aplanados])])
+    filepath = Path(filepath)
+    try:
+        data = load_file(filepath)
+    except OSError:
+        raise  # archivo ilegible: no es un JSON inválido, se corta la corrida como siempre
+    except Exception as e:
+        return filepath.name, str(e), []
+    return filepath.name, None, flatten_document(data)
+
+
+def list_sources(json_folder, token_file):
+    # Orden alfabético: os.listdir no garantiza orden y los IDs dependen de él
+    return SourceCatalog.scan([json_folder], exclude_names=(token_file.name,)).paths
+
+
+def parse_sources(sources, workers=1):
+    if workers > 1 and len(sources) > 1:
+        # Cada proceso usa el mismo backend JSON que el principal
+        with ProcessPoolExecutor(max_workers=min(workers, len(sources)), initializer=use_backend,
+                                 initargs=(current_backend(),)) as pool:
+            yield from pool.map(parse_source, sources)
+    else:
+        for source in sources:
+            yield parse_source(source)
+
+
+def ingest(sources, workers=1, manifest=None):
+    # Con manifiesto, los archivos sin cambios se toman de la caché y solo se
+    # parsean los modificados; el orden de salida sigue siendo el de sources
+    cached = {}
+    if manifest is not None:
+        cached = {source: manifest.load_cached(source) for source in sources}
+    parsed = parse_sources([s for s in sources if cached.get(s) is None], workers)
+    for source in sources:
+        result = cached.get(source)
+        if result is None:
+            result = next(parsed)
+            if manifest is not None:
+                manifest.store_cached(source, result)
+        yield result
+
+
+# ========== MODO INCREMENTAL (--incremental) ==========
+# El manifiesto guarda, por archivo de entrada, tamaño, mtime y sha256 del contenido,
+# además de las filas aplanadas de cada archivo. Un archivo cuyo tamaño y mtime no
+# cambiaron (o cuyo hash coincide) se reutiliza sin volver a parsearlo. Si ninguna
+# entrada, token.json, el código (CODE_FILES, incluido modelo.sql), las opciones que
+# cambian la salida ni los CSVs generados cambiaron, la corrida termina sin reconstruir nada.
+
+# Archivos junto al script de los que dependen las filas cacheadas y los CSVs
+CODE_FILES = ('jsontocsv.py', 'dbload.py', 'delta.py', 'dimensions.py', 'jsonbackend.py', 'quotas.py',
+              'records.py', 'schema.py', 'sources.py', 'modelo.sql')
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_sha256():
+    h = hashlib.sha256()
+    for name in CODE_FILES:
+        path = Path(__file__).with_name(name)
+        h.update(f"{name}:{file_sha256(path) if path.exists() else ''}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+class BuildManifest:
+    VERSION = 2
+
+    def __init__(self, folder, options=None):
+        # options: opciones de la corrida que cambian la salida (--capacity, --compress, ...)
+        self.folder = Path(folder)
+        self.path = self.folder / 'manifest.json'
+        self.code = code_sha256()
+        self.options = dict(options or {})
+        self.hashes = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        # Un cambio de versión o del código invalida todo lo cacheado
+        if self.data.get('version') != self.VERSION or self.data.get('code') != self.code:
+            self.data = {'version': self.VERSION, 'code': self.code}
+        self.data.setdefault('files', {})
+        self.data.setdefault('outputs', {})
+
+    def _entry(self, path):
+        st = path.stat()
+        previous = self.data['files'].get(path.name)
+        if previous and previous['size'] == st.st_size and previous['mtime_ns'] == st.st_mtime_ns:
+            sha = previous['sha256']
+        else:
+            sha = self.hashes.get(path.name) or file_sha256(path)
+        self.hashes[path.name] = sha
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha}
+
+    def unchanged(self, path):
+        path = Path(path)
+        previous = self.data['files'].get(path.name)
+        return previous is not None and previous['sha256'] == self._entry(path)['sha256']
+
+    def outputs_unchanged(self, folder):
+        outputs = self.data['outputs']
+        if not outputs:
+            return False
+        for name, (size, mtime_ns) in outputs.items():
+            try:
+                st = (Path(folder) / name).stat()
+            except OSError:
+                return False
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                return False
+        return True
+
+    def up_to_date(self, sources, token_file, output_folder):
+        names = {Path(s).name for s in sources} | {token_file.name}
+        if names != set(self.data['files']) or self.data.get('options') != self.options:
+            return False
+        return (all(self.unchanged(s) for s in sources) and self.unchanged(token_file)
+                and self.outputs_unchanged(output_folder))
+
+    def _cache_path(self, path):
+        return self.folder / f"{Path(path).name}.records.json"
+
+    def load_cached(self, path):
+        if not self.unchanged(path):
+            return None
+        # Solo datos (JSON), nunca pickle: la caché es un archivo en disco que
+        # cualquiera con acceso a la carpeta podría reemplazar
+        try:
+            with open(self._cache_path(path), 'r', encoding='utf-8') as f:
+                name, error, projects = json.load(f)
+            return name, error, [(project_name, [MicroserviceRecord.from_state(state) for state in records])
+                                 for project_name, records in projects]
+        except (OSError, ValueError, TypeError):
+            # Caché ilegible o con otro formato: el archivo se vuelve a parsear
+            return None
+
+    def store_cached(self, path, result):
+        path = Path(path)
+        self.folder.mkdir(exist_ok=True)
+        name, error, projects = result
+        data = [name, error, [[project_name, [rec.__getstate__() for rec in records]]
+                              for project_name, records in projects]]
+        with open(self._cache_path(path), 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        self.data['files'][path.name] = self._entry(path)
+
+    def save(self, sources, token_file, output_folder):
+        # Olvidar archivos que ya no existen y registrar token.json y los CSVs generados
+        names = {Path(s).name for s in sources}
+        for name in list(self.data['files']):
+            if name not in names and name != token_file.name:
+                del self.data['files'][name]
+                self._cache_path(name).unlink(missing_ok=True)
+        # Cachés .pickle de versiones anteriores del manifiesto
+        for legacy in self.folder.glob('*.pickle'):
+            legacy.unlink(missing_ok=True)
+        self.data['files'][token_file.name] = self._entry(token_file)
+        self.data['options'] = self.options
+        self.data['outputs'] = {}
+        for f in sorted(Path(output_folder).iterdir()):
+            if not f.name.endswith(TABLE_SUFFIXES):
                 continue
+            st = f.stat()
+            self.data['outputs'][f.name] = [st.st_size, st.st_mtime_ns]
+        self.folder.mkdir(exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+
+
+# ========== LECTURA INCREMENTAL (modo --stream) ==========
+# Lee el arreglo 'project' / 'projects' de un export ítem por ítem, sin cargar el
+# documento completo. Cada ítem se decodifica con JSONDecoder.raw_decode sobre un
+# buffer que se descarta a medida que se consume.
+
+class JsonStreamReader:
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size=0):
+        # Descarta lo ya consumido y lee al menos min_size caracteres más
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.f.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ''
+            self._fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Se esperaba '{char}' y se encontró '{found}'")
+        self.pos += 1
+
+    def skip(self, char):
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Un número al final del buffer podría continuar en el siguiente bloque
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Ítem incompleto: duplicar lo leído mantiene los reintentos en O(n) amortizado
+            self._fill(len(self.buf) - self.pos)
+
+
+def iter_projects(filepath):
+    # Mismo criterio que data.get('project') or data.get('projects'): el arreglo 'project'
+    # si tiene al menos un proyecto y, si no, el de 'projects'. 'project' se emite en la
+    # primera pasada; 'projects' no se puede emitir hasta saber si más adelante hay un
+    # 'project' con proyectos, así que se saltea ítem por ítem y, si hace falta, se lee en
+    # una segunda pasada. Diferencia conocida: con una clave repetida se usa la primera
+    # aparición con proyectos (json.load se queda con la última).
+    if (yield from project_array_pass(filepath, 'project')):
+        yield from project_array_pass(filepath, 'projects')
+
+
+def project_array_pass(filepath, emit_key):
+    # Recorre el objeto raíz completo y emite los ítems del primer arreglo emit_key con
+    # proyectos. Devuelve True si no emitió nada y 'projects' tenía al menos un proyecto.
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f)
+        reader.expect('{')
+        emitted = projects_found = False
+        while reader.peek() != '}':
+            key = reader.value()
+            reader.expect(':')
+            if key in ('project', 'projects') and reader.peek() == '[':
+                emit = key == emit_key and not emitted
+                reader.expect('[')
+                while reader.peek() != ']':
+                    item = reader.value()
+                    if emit:
+                        emitted = True
+                        yield item
+                    elif key == 'projects':
+                        projects_found = True
+                    reader.skip(',')
+                reader.expect(']')
+            else:
+                reader.value()
+            reader.skip(',')
+    return not emitted and projects_found
+
+
+def stream_source(filepath):
+    # Equivalente perezoso de parse_source: los proyectos se leen y aplanan a medida
+    # que se consumen. Un error de lectura a mitad de archivo corta ese archivo.
+    filepath = Path(filepath)
+
+    def projects():
+        try:
+            for project in iter_projects(filepath):
+                yield project.get('name', ''), [flatten_ms(ms) for ms in project.get('ms', [])]
+        except ValueError as e:
+            print(f"⚠️ Error al leer {filepath.name}: {e}")
+
+    return filepath.name, None, projects()
+
+
+# ========== ASIGNACIÓN DE IDs ==========
+
+class IngestState:
+    # Dimensiones (valor -> id) compartidas por todas las etapas
+    def __init__(self, token_id_map, openshift_map, verbose=False, catalog=None, quota_profiles=False,
+                 token_resolver=None):
+        self.verbose = verbose  # salida por proyecto y microservicio (--verbose)
+        self.catalog = catalog  # SourceCatalog de las entradas: cada fila general lleva su archivo
+        self.token_id_map = token_id_map
+        self.token_resolver = token_resolver  # TokenResolver de token.json, para los tokenOcp sin id exacto
+        self.openshift_map = openshift_map
+        # Encabezados y proyectores de modelo.sql para esta corrida
+        self.model = model_tables()
+        schema = self.model.schema
+        self.project = Dimension('project_directory', schema.columns('project_directory'), ('project_name',))
+        self.appname = Dimension('appname_directory', schema.columns('appname_directory'), ('app',))
+        # (id_appname, repo_url)
+        self.app_dir = Dimension('app_directory', schema.columns('app_directory'), ('id_appname', 'repo_url'),
+                                 row=app_directory_row)
+        self.env = Dimension('env_directory', schema.columns('env_directory'), ('env',))
+        self.country = Dimension('country_directory', schema.columns('country_directory'), ('country',))
+        self.label = Dimension('label_directory', schema.columns('label_directory'), ('app_label',))
+        self.usage = Dimension('usage_directory', schema.columns('usage_directory'), ('usage',))
+        self.path = Dimension('path_directory', schema.columns('path_directory'), ('volume_path',))
+        self.image = Dimension('image_directory', schema.columns('image_directory'), ('image_name',))
+        # (source_file, project_name, appName, env) -> id; la tabla es la de hechos, no se exporta
+        self.microservice = Dimension('microservice_properties_directory')
+        self.dimensions = {d.table: d for d in (
+            self.project, self.appname, self.app_dir, self.env, self.country, self.label, self.usage,
+            self.path, self.image, self.microservice)}
+        # --quota-profiles: (cpulimits, cpurequest, memorylimits, memoryrequest, replicas) -> id
+        self.quota_profile = None
+        self.ms_headers = self.model.ms_headers
+        self.ms_row = self.model.project_ms_row
+        if quota_profiles:
+            self.quota_profile = Dimension('quota_profile_directory', schema.columns('quota_profile_directory'),
+                                           QUOTA_COLUMNS)
+            self.dimensions[self.quota_profile.table] = self.quota_profile
+            self.ms_headers = self.model.ms_profile_headers
+            self.ms_row = self.model.project_ms_profile_row
+        # Con --delta: ids de app_general_properties, microservice_drs_config y token_directory
+        self.general_ids = None
+        self.drs_ids = None
+        self.token_ids = None
+
+    def keep_ids(self, previous):
+        # Modo --delta: los valores que ya estaban en la foto anterior conservan su id.
+        # Los microservicios se reconocen por (proyecto, appName, ambiente), sin el archivo.
+        for table, dimension in self.dimensions.items():
+            if dimension.key_columns:
+                dimension.keep_ids(previous.get(table))
+        self.microservice.keep_ids(previous.get('microservice'), key=lambda k: csv_text(k[1:]))
+        self.general_ids = IdAllocator(previous.get('general'))
+        self.drs_ids = IdAllocator(previous.get('drs'))
+        self.token_ids = IdAllocator(previous.get('token'))
+
+    def token_id(self, token_ocp, env):
+        # id_token_directory: por nombre exacto en token_directory y, si no está, por el
+        # tokenname que TokenResolver encuentra en token.json para ese ambiente
+        token_id = self.token_id_map.get(token_ocp)
+        if token_id is None and self.token_resolver is not None:
+            token_id = self.token_id_map.get(self.token_resolver.resolve(token_ocp, env))
+        return '' if token_id is None else token_id
+
+    def image_id(self, base_image_version):
+        if base_image_version:
+            return self.image[base_image_version]
+        return ''
+
+
+def app_directory_row(id_, value):
+    appname_id, repo_url = value
+    return (id_, appname_id, repo_url.split('/')[-1] if repo_url else '', repo_url)
+
+
+def merge_records(state, results):
+    # Asigna los IDs en el orden de los archivos y produce (fila microservicio, fila general)
+    for filename, error, projects in results:
+        if error:
+            print(f"⚠️ Error al leer {filename}: {error}")
+            continue
         print(f"Procesando archivo: {filename}")
-        projects = data.get('project') or data.get('projects') or []
-        for project in projects:
-            project_name = project.get('name', '')
-            print(f"  Proyecto: {project_name}")
-            for ms in project.get('ms', []):
-                config = ms.get('config', {})
-                app_name = ''
-                if isinstance(config, str):
-                    try:
-                        config = json.loads(config)
-                    except Exception:
-                        config = {}
-                if isinstance(config, dict):
-                    app_name = config.get('appName', '')
-                print(f"    Microservicio: {app_name}")
-                appname_id = get_or_create_id(appname_id_map, app_name, 'appname_counter')
-                repo_url = ms.get('repositoryUrl')
-                app_dir_key = (appname_id, repo_url)
-                if app_dir_key not in app_dir_id_map:
-                    app_dir_id_map[app_dir_key] = app_dir_counter
-                    app_dir_counter += 1
-                app_dir_id = app_dir_id_map[app_dir_key]
-                country = get_key_insensitive(config, 'country')
-                country_id = get_or_create_id(country_id_map, country, 'country_counter')
-                label = get_key_insensitive(config, 'ocpLabel')
-                label_id = get_or_create_id(label_id_map, label, 'label_counter')
+        source = state.catalog.get(filename) if state.catalog is not None else None
+        # Dimensiones en variables locales: cada id es un acceso a dict (los valores nuevos los crea __missing__)
+        appname_ids = state.appname
+        app_dir_ids = state.app_dir
+        country_ids = state.country
+        label_ids = state.label
+        usage_ids = state.usage
+        project_ids = state.project
+        env_ids = state.env
+        ms_ids = state.microservice
+        path_ids = state.path
+        quota_ids = state.quota_profile
+        for project_name, records in projects:
+            if state.verbose:
+                print(f"  Proyecto: {project_name}")
+            for rec in records:
+                app_name = rec.appName
+                if state.verbose:
+                    print(f"    Microservicio: {app_name}")
+                appname_id = appname_ids[app_name]
+                repo_url = rec.repositoryUrl
+                app_dir_id = app_dir_ids[appname_id, repo_url]
+                country = rec.country
+                country_id = country_ids[country]
+                label = rec.ocpLabel
+                label_id = label_ids[label]
                 # --- NUEVO: usage_directory ---
-                usage = get_key_insensitive(config, 'usage')
+                usage = rec.usage
                 if not usage:
                     usage = 'internal'
-                if usage not in usage_id_map:
-                    usage_id_map[usage] = usage_counter
-                    usage_counter += 1
-                id_usage_directory = usage_id_map[usage]
+                id_usage_directory = usage_ids[usage]
                 # Obtener o crear el id del proyecto para project_directory
-                project_id = get_or_create_id(project_id_map, project_name, 'project_counter')
-                # Buscar claves de resQuotas insensible a mayúsculas/minúsculas
-                def get_quota_key_insensitive(d, env):
-                    for k in d.keys():
-                        if k.lower() == f"resquotas{env}".lower():
-                            return d[k]
-                    return None
-                for env in ['dev', 'qa', 'master']:
-                    env_id = get_or_create_id(env_id_map, env, 'env_counter')
-                    token_ocp = ms.get('tokenOcp')
-                    # --- NUEVO: id_token_directory ---
-                    id_token_directory = token_id_map.get(token_ocp, '')
-                    quotas = {
-                        'dev': get_quota_key_insensitive(config, 'dev'),
-                        'qa': get_quota_key_insensitive(config, 'qa'),
-                        'master': get_quota_key_insensitive(config, 'master'),
-                    }
-                    if not quotas['dev'] and not quotas['qa'] and quotas['master']:
-                        quotas['dev'] = quotas['qa'] = quotas['master']
-                    elif quotas['dev'] and not quotas['qa'] and not quotas['master']:
-                        quotas['qa'] = quotas['master'] = quotas['dev']
-                    env_quota = quotas.get(env)
-                    if env_quota:
-                        quota_item = env_quota[0] if isinstance(env_quota, list) else env_quota
-                        # --- AJUSTE: Si replicas no existe, ponerle 1 ---
-                        replicas_value = quota_item.get('replicas')
-                        if replicas_value is None:
-                            replicas_value = 1
-                        ms_key = (filename, project_name, app_name, env)
-                        if ms_key not in ms_id_map:
-                            ms_id_map[ms_key] = ms_id_counter
-                            ms_id_counter += 1
-                        ms_id = ms_id_map[ms_key]
-                        # --- Buscar combinatoria en openshift_properties_directory predefinida ---
-                        secrets_enabled = any(s.get('secret', False) for s in get_key_insensitive(config, 'secrets'))
-                        configmap_enabled = any(c.get('configMap', False) for c in get_key_insensitive(config, 'configMaps'))
-                        volume_enabled = any(v.get('volume', False) for v in get_key_insensitive(config, 'volumes'))
-                        openshift_key = (secrets_enabled, configmap_enabled, volume_enabled)
-                        id_openshift = openshift_map.get(openshift_key)
-                        if id_openshift is None:
-                            print(f"⚠️ Combinatoria {openshift_key} no encontrada en openshift_properties_directory.csv para {filename} {project_name} {app_name} {env}")
-                            id_openshift = ''
-                        # Extraer baseImageVersion para la imagen
-                        base_image_version = get_key_insensitive(config, 'baseImageVersion')
-                        # --- NUEVO: path_directory ---
-                        # Buscar el primer mountPath de volumes (si existe)
-                        volumes = get_key_insensitive(config, 'volumes')
-                        volume_path = ''
-                        if volumes and isinstance(volumes, list) and len(volumes) > 0:
-                            volume_path = volumes[0].get('mountPath', '')
-                        if volume_path not in path_id_map:
-                            path_id_map[volume_path] = path_counter
-                            path_counter += 1
-                        id_path_directory = path_id_map[volume_path]
-                        microservice_rows.append({
-                            'id': ms_id,
-                            'id_usage_directory': id_usage_directory,
-                            'cpulimits': quota_item.get('cpuLimits'),
-                            'cpurequest': quota_item.get('cpuRequest'),
-                            'memorylimits': quota_item.get('memoryLimits'),
-                            'memoryrequest': quota_item.get('memoryRequest'),
-                            'replicas': replicas_value,
-                            'id_token_directory': id_token_directory,
-                            'id_openshift_properties_directory': id_openshift,
-                            'id_path_directory': id_path_directory,
-                            'drs_enabled': False,
-                            'baseImageVersion': base_image_version
-                        })
-                        # app_general_properties row
-                        general_rows.append({
-                            'id_microservice_directory': ms_id,
-                            'id_project_directory': project_id,
-                            'id_app_directory': app_dir_id,
-                            'id_env_directory': env_id,
-                            'id_country_directory': country_id,
-                            'id_label_directory': label_id,
-                            'project_name': project_name,
-                            'appName': app_name,
-                            'repositoryUrl': ms.get('repositoryUrl'),
-                            'buildConfigurationMode': ms.get('buildConfigurationMode'),
-                            'env': env,
-                            'country': country,
-                            'ocpLabel': label,
-                            'project': get_key_insensitive(config, 'project'),
-                            'baseImageVersion': get_key_insensitive(config, 'baseImageVersion'),
-                            'config': ms.get('config', '')  # Guardar el string original para DRS
-                        })
-
-# ========== LÓGICA PARA id_image_directory usando baseImageVersion ========== 
-image_id_map = {}
-image_counter = 1
-for row in microservice_rows:
-    base_image_version = row.get('baseImageVersion', '')
-    if base_image_version and base_image_version not in image_id_map:
-        image_id_map[base_image_version] = image_counter
-        image_counter += 1
-    row['id_image_directory'] = image_id_map.get(base_image_version, '')
-
-# Escribir image_directory.csv
-image_rows = []
-for name, id_ in image_id_map.items():
-    image_rows.append({'id': id_, 'image_name': name})
-with open(csv_folder / 'image_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'image_name'])
-    writer.writeheader()
-    writer.writerows(image_rows)
-
-# Escribir microservice_properties_directory.csv con el orden de columnas de la tabla SQL
-ms_headers_sql = [
-    'id',
-    'id_usage_directory',
-    'cpulimits',
-    'cpurequest',
-    'memorylimits',
-    'memoryrequest',
-    'replicas',
-    'id_token_directory',
-    'id_openshift_properties_directory',
-    'id_path_directory',
-    'id_image_directory',
-]
-filtered_microservice_rows = []
-for r in microservice_rows:
-    filtered_row = {k: r.get(k, '') for k in ms_headers_sql}
-    filtered_microservice_rows.append(filtered_row)
-with open(csv_folder / 'microservice_properties_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=ms_headers_sql)
-    writer.writeheader()
-    writer.writerows(filtered_microservice_rows)
-
-# Escribir app_general_properties.csv SOLO con los campos de la tabla SQL y los IDs correctos
-app_headers_sql = [
-    'id',
-    'id_project_directory',
-    'id_app_directory',
-    'id_person_in_charge',
-    'id_security_champion',
-    'id_env_directory',
-    'id_country_directory',
-    'id_label_directory',
-    'id_app_type_directory',
-    'id_pipeline_properties_directory',
-    'id_pipeline_general_properties_directory',
-    'id_runtime_directory',
-    'sonarqubepath_exec',
-    'id_microservice_directory',
-    'id_datastage_properties_directory',
-    'id_database_properties_directory',
-    'id_was_properties_directory',
-    'id_pims_properties_directory',
-]
-filtered_general_rows = []
-for i, r in enumerate(general_rows, 1):
-    filtered_row = {k: r.get(k, '') for k in app_headers_sql}
-    filtered_row['id'] = i
-    # Asignar id_pipeline_properties_directory según la combinación real
-    filtered_row['id_pipeline_properties_directory'] = r.get('id_pipeline_properties_directory', 1)
-    filtered_row['id_pipeline_general_properties_directory'] = filtered_row['id_pipeline_properties_directory']
-    filtered_general_rows.append(filtered_row)
-with open(csv_folder / 'app_general_properties.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=app_headers_sql)
-    writer.writeheader()
-    writer.writerows(filtered_general_rows)
-
-# ========== NUEVO: Generar CSVs para todas las tablas del modelo.sql ==========
-# Utilidad para crear CSVs vacíos con encabezados de las tablas del modelo.sql
-all_tables = {
-    'project_directory': [
-        'id', 'project_name', 'project_acronym'
-    ],
-    'appname_directory': [
-        'id', 'app'
-    ],
-    'app_directory': [
-        'id', 'id_appname', 'repo_name', 'repo_url'
-    ],
-    'env_directory': [
-        'id', 'env'
-    ],
-    'country_directory': [
-        'id', 'country'
-    ],
-    'label_directory': [
-        'id', 'app_label'
-    ],
-    'app_type_directory': [
-        'id', 'app_type'
-    ],
-    'pipeline_properties_directory': [
-        'id', 'securitygate', 'unittests', 'sonarqube', 'qualitygate'
-    ],
-    'runtime_directory': [
-        'id', 'runtime_name', 'version_path'
-    ],
-    'person_in_charge': [
-        'id', 'nombre', 'email'
-    ],
-    'security_champion': [
-        'id', 'nombre', 'email'
-    ],
-    'token_directory': [
-        'id', 'token', 'namespace_name'
-    ],
-    'openshift_properties_directory': [
-        'id', 'secrets_enabled', 'configmap_enabled', 'volume_enabled'
-    ],
-    'usage_directory': [
-        'id', 'usage'
-    ],
-    'image_directory': [
-        'id', 'image_name'
-    ],
-    'path_directory': [
-        'id', 'volume_path'
-    ],
-    'microservice_properties_directory': [
-        'id', 'id_usage_directory', 'cpulimits', 'cpurequest', 'memorylimits', 'memoryrequest', 'replicas', 'id_token_directory', 'id_openshift_properties_directory', 'id_path_directory', 'drs_enabled', 'id_image_directory', 'token', 'tokenOcp', 'secrets_enabled', 'configmap_enabled', 'volume_enabled'
-    ],
-    'datastage_properties_directory': [
-        'id'
-    ],
-    'database_properties_directory': [
-        'id'
-    ],
-    'was_properties_directory': [
-        'id', 'host', 'instance_name', 'context_root'
-    ],
-    'pims_properties_directory': [
-        'id', 'nexus_url'
-    ],
-    'app_general_properties': [
-        'id', 'id_project_directory', 'id_app_directory', 'id_person_in_charge', 'id_security_champion', 'id_env_directory', 'id_country_directory', 'id_label_directory', 'id_app_type_directory', 'id_pipeline_properties_directory', 'id_pipeline_general_properties_directory', 'id_runtime_directory', 'sonarqubepath_exec', 'id_microservice_directory', 'id_datastage_properties_directory', 'id_database_properties_directory', 'id_was_properties_directory', 'id_pims_properties_directory', 'project_name', 'appName', 'repositoryUrl', 'buildConfigurationMode', 'env', 'country', 'ocpLabel', 'project', 'baseImageVersion'
-    ]
-}
-
-# Eliminar todos los CSVs existentes en la carpeta de salida antes de crear nuevos
-for f in csv_folder.glob('*.csv'):
-    # No borrar openshift_properties_directory.csv ni pipeline_properties_directory.csv
-    if f.name not in ['openshift_properties_directory.csv', 'pipeline_properties_directory.csv']:
+                project_id = project_ids[project_name]
+                openshift_key = rec.openshift_key
+                volume_path = rec.volume_path
+                for env in ENVS:
+                    env_id = env_ids[env]
+                    quota_item = rec.quota_items[env]
+                    if quota_item is None:
+                        continue
+                    # --- AJUSTE: Si replicas no existe, ponerle 1 ---
+                    replicas_value = quota_item.get('replicas')
+                    if replicas_value is None:
+                        replicas_value = 1
+                    ms_id = ms_ids[filename, project_name, app_name, env]
+                    # --- Buscar combinatoria en openshift_properties_directory predefinida ---
+                    id_openshift = state.openshift_map.get(openshift_key)
+                    if id_openshift is None:
+                        print(f"⚠️ Combinatoria {openshift_key} no encontrada en openshift_properties_directory.csv para {filename} {project_name} {app_name} {env}")
+                        id_openshift = ''
+                    # --- NUEVO: path_directory ---
+                    id_path_directory = path_ids[volume_path]
+                    ms_row = MicroserviceRow(
+                        id=ms_id,
+                        id_usage_directory=id_usage_directory,
+                        quota_item=quota_item,
+                        replicas=replicas_value,
+                        id_token_directory=state.token_id(rec.tokenOcp, env),
+                        id_openshift_properties_directory=id_openshift,
+                        id_path_directory=id_path_directory,
+                        baseImageVersion=rec.baseImageVersion,
+                    )
+                    if quota_ids is not None:
+                        # dev/qa/master suelen heredar la misma cuota: una sola fila de perfil
+                        ms_row.id_quota_profile_directory = quota_ids[
+                            ms_row.cpulimits, ms_row.cpurequest, ms_row.memorylimits, ms_row.memoryrequest,
+                            replicas_value]
+                    # app_general_properties row
+                    general_row = GeneralRow(
+                        id_microservice_directory=ms_id,
+                        id_project_directory=project_id,
+                        id_app_directory=app_dir_id,
+                        id_env_directory=env_id,
+                        id_country_directory=country_id,
+                        id_label_directory=label_id,
+                        project_name=project_name,
+                        env=env,
+                        record=rec,
+                        source=source,
+                    )
+                    yield ms_row, general_row
+
+
+# ========== ESCRITURA DE CSVs ==========
+# Cada tabla se escribe una sola vez, con buffer grande, en una carpeta temporal junto a
+# csv_output. Al terminar, la carpeta temporal reemplaza a csv_output con dos renombres
+# (csv_output -> .old, temporal -> csv_output): quien lea la carpeta ve la versión anterior
+# completa o la nueva completa, nunca una a medio borrar o a medio escribir.
+# Las tablas son independientes, así que con workers > 1 write_rows solo encola la tabla
+# y un pool de hilos las serializa en paralelo (la compresión y la escritura a disco
+# liberan el GIL); commit() espera a que terminen todas. Con compresión cada archivo
+# queda como <tabla>.csv.gz o <tabla>.csv.zst con el mismo contenido descomprimido.
+# Con reuse (modo --watch) cada tabla deja una huella de sus filas: si en la corrida
+# siguiente la huella es la misma, el archivo anterior se enlaza en la carpeta nueva en
+# lugar de volver a escribirlo.
+
+# Sufijo de cada compresión soportada (zstd requiere el paquete zstandard)
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+TABLE_SUFFIXES = ('.csv',) + tuple(f".csv{suffix}" for suffix in COMPRESSION_SUFFIXES.values())
+
+
+def open_text(path, mode='r', buffering=-1):
+    # Abre un CSV de salida en modo texto según su extensión (.csv, .csv.gz, .csv.zst)
+    path = Path(path)
+    if path.suffix == '.gz':
+        # mtime=0: el mismo contenido produce el mismo .gz byte a byte
+        raw = gzip.GzipFile(path, mode + 'b', compresslevel=6, mtime=0)
+        return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    if path.suffix == '.zst':
         try:
-            f.unlink()
-        except Exception as e:
-            print(f"No se pudo eliminar {f}: {e}")
-
-# Generar CSV vacío para cada tabla si no existe
-for table, headers in all_tables.items():
-    csv_path = csv_folder / f"{table}.csv"
-    if not csv_path.exists():
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-
-# ========== NUEVO: Poblar los CSVs de las tablas directory con los valores únicos e IDs usados ==========
-# Guardar los valores únicos e IDs en los CSVs directory
-
-def write_directory_csv(filename, headers, id_map, extra_fields=None):
-    rows = []
-    for value, id_ in id_map.items():
-        row = {'id': id_}
-        if len(headers) > 1:
-            row[headers[1]] = value
-        if extra_fields:
-            for k, v in extra_fields.items():
-                row[k] = v(value)
-        rows.append(row)
-    with open(csv_folder / filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(rows)
-
-write_directory_csv('project_directory.csv', ['id', 'project_name', 'project_acronym'], project_id_map, extra_fields={'project_acronym': lambda v: ''})
-write_directory_csv('appname_directory.csv', ['id', 'app'], appname_id_map)
-write_directory_csv('env_directory.csv', ['id', 'env', 'reponexus'], env_id_map, extra_fields={'reponexus': lambda v: ''})
-write_directory_csv('country_directory.csv', ['id', 'country'], country_id_map)
-write_directory_csv('label_directory.csv', ['id', 'app_label'], label_id_map)
-
-# app_directory.csv requiere id_appname y repo_url
-app_dir_rows = []
-for (appname_id, repo_url), id_ in app_dir_id_map.items():
-    app_dir_rows.append({
-        'id': id_,
-        'id_appname': appname_id,
-        'repo_name': repo_url.split('/')[-1] if repo_url else '',
-        'repo_url': repo_url
-    })
-with open(csv_folder / 'app_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'id_appname', 'repo_name', 'repo_url'])
-    writer.writeheader()
-    writer.writerows(app_dir_rows)
-
-# ========== AJUSTE: Normalizar openshift_properties_directory y referenciar su id ==========
-# 1. Crear combinaciones únicas de (secrets_enabled, configmap_enabled, volume_enabled) como booleanos
-openshift_map = {}
-openshift_id_map = {}
-openshift_counter = 1
-for row in microservice_rows:
-    key = (bool(row.get('secrets_enabled')), bool(row.get('configmap_enabled')), bool(row.get('volume_enabled')))
-    if key not in openshift_map:
-        openshift_map[key] = openshift_counter
-        openshift_id_map[openshift_counter] = {
-            'id': openshift_counter,
-            'secrets_enabled': key[0],
-            'configmap_enabled': key[1],
-            'volume_enabled': key[2]
-        }
-        openshift_counter += 1
-# 2. Eliminar los campos de microservice_properties_directory que no corresponden
-for row in microservice_rows:
-    row.pop('secrets_enabled', None)
-    row.pop('configmap_enabled', None)
-    row.pop('volume_enabled', None)
-
-# 3. Reescribir microservice_properties_directory.csv sin los campos removidos
-ms_headers_sql = [
-    'id',
-    'id_usage_directory',
-    'cpulimits',
-    'cpurequest',
-    'memorylimits',
-    'memoryrequest',
-    'replicas',
-    'id_token_directory',
-    'id_openshift_properties_directory',
-    'id_path_directory',
-    'id_image_directory',
-]
-filtered_microservice_rows = []
-for r in microservice_rows:
-    filtered_row = {k: r.get(k, '') for k in ms_headers_sql}
-    filtered_microservice_rows.append(filtered_row)
-with open(csv_folder / 'microservice_properties_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=ms_headers_sql)
-    writer.writeheader()
-    writer.writerows(filtered_microservice_rows)
-
-# ========== AJUSTE: Normalizar pipeline_properties_directory y referenciar su id ==========
-# 1. Crear combinaciones posibles de (securitygate, unittests, sonarqube, qualitygate)
-pipeline_fields = ['securitygate', 'unittests', 'sonarqube', 'qualitygate']
-pipeline_combinations = list(product([True, False], repeat=4))
-pipeline_id_map = {}
-for idx, combo in enumerate(pipeline_combinations, 1):
-    pipeline_id_map[combo] = idx
-
-# Escribir pipeline_properties_directory.csv con todas las combinaciones
-with open(csv_folder / 'pipeline_properties_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id'] + pipeline_fields)
-    writer.writeheader()
-    for idx, combo in enumerate(pipeline_combinations, 1):
-        row = {'id': idx}
-        for i, field in enumerate(pipeline_fields):
-            row[field] = combo[i]
-        writer.writerow(row)
+            import zstandard
+        except ImportError:
+            raise SystemExit("Para leer o escribir .zst se necesita zstandard (pip install zstandard)")
+        return zstandard.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, newline='', encoding='utf-8', buffering=buffering)
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def find_table(folder, table):
+    # Ruta del CSV de la tabla en folder, comprimido o no; None si no existe
+    for suffix in TABLE_SUFFIXES:
+        path = Path(folder) / f"{table}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def folder_mode(folder):
+    try:
+        return stat.S_IMODE(os.stat(folder).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o777 & ~umask
+
+
+class OutputStage:
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, folder, snapshot=True, workers=1, compression=None, reuse=None):
+        # snapshot=False (carpeta de --delta): sin CSVs vacíos del modelo ni archivos de la versión anterior
+        # reuse: tabla -> (huella, tamaño y mtime del archivo) de la corrida anterior; se actualiza en commit()
+        self.folder = Path(folder)
+        self.snapshot = snapshot
+        self.suffix = COMPRESSION_SUFFIXES[compression] if compression else ''
+        self.folder.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = Path(tempfile.mkdtemp(prefix=f".{self.folder.name}.tmp-", dir=self.folder.parent))
+        self.written = set()
+        self.rows = {}
+        self.seconds = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.pending = []
+        self.reuse = reuse
+        self.digests = {}
+        self.reused = set()
+
+    def _path(self, filename):
+        return self.tmp / f"{filename}{self.suffix}"
+
+    def _open(self, filename):
+        if filename in self.written:
+            raise ValueError(f"La tabla {filename} ya fue escrita en esta corrida")
+        self.written.add(filename)
+        return open_text(self._path(filename), 'w', buffering=self.BUFFER_SIZE)
+
+    def write_table(self, filename, headers, rows):
+        # Filas como dicts (columnas faltantes quedan vacías, como en csv.DictWriter)
+        self.write_rows(filename, headers, [tuple(row.get(h, '') for h in headers) for row in rows])
+
+    def write_rows(self, filename, headers, rows):
+        # Filas ya proyectadas como tuplas en el orden de headers. Con pool la tabla se
+        # escribe en segundo plano: quien llama no debe modificar rows después.
+        if self.reuse is not None and self._link_unchanged(filename, headers, rows):
+            return
+        f = self._open(filename)
+        if self.pool is None:
+            self._write(f, filename, headers, rows)
+        else:
+            self.pending.append(self.pool.submit(self._write, f, filename, headers, rows))
+
+    def _write(self, f, filename, headers, rows):
+        start = time.perf_counter()
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        self.rows[filename] = len(rows)
+        self.seconds[filename] = time.perf_counter() - start
+
+    def _link_unchanged(self, filename, headers, rows):
+        # pickle distingue 1, 1.0 y True (que == no distingue): una huella igual es el mismo CSV.
+        # Dos listas iguales pueden dar huellas distintas; en ese caso la tabla solo se reescribe.
+        start = time.perf_counter()
+        digest = hashlib.blake2b(pickle.dumps((headers, rows), protocol=pickle.HIGHEST_PROTOCOL)).digest()
+        self.digests[filename] = digest
+        previous = self.folder / f"{filename}{self.suffix}"
+        known = self.reuse.get(filename)
+        if known is None or known[0] != digest or file_signature(previous) != known[1]:
+            return False
+        self.written.add(filename)
+        try:
+            os.link(previous, self._path(filename))
+        except OSError:
+            shutil.copy2(previous, self._path(filename))
+        self.reused.add(filename)
+        self.rows[filename] = len(rows)
+        self.seconds[filename] = time.perf_counter() - start
+        return True
+
+    def write_text(self, filename, text):
+        with self._open(filename) as f:
+            f.write(text)
+
+    @contextmanager
+    def stream_table(self, filename, headers):
+        # Para el modo --stream: csv.writer de tuplas abierto durante toda la ingesta
+        with self._open(filename) as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            yield writer
+
+    def flush(self):
+        # Espera las tablas encoladas; el primer error se propaga
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+    def commit(self):
+        # CSV vacío (solo encabezados) para cada tabla del modelo que no se generó
+        schema = load_schema() if self.snapshot else {}
+        for table in schema:
+            if f"{table}.csv" not in self.written:
+                self.write_rows(f"{table}.csv", schema.columns(table), [])
+        self.flush()
+        if self.pool is not None:
+            self.pool.shutdown()
+        # Los archivos que no son tablas dentro de csv_output se conservan
+        if self.snapshot and self.folder.is_dir():
+            for f in self.folder.iterdir():
+                if f.is_file() and not f.name.endswith(TABLE_SUFFIXES):
+                    shutil.copy2(f, self.tmp / f.name)
+        # mkdtemp crea la carpeta con 0700: se deja con los permisos de la anterior (o los del umask)
+        os.chmod(self.tmp, folder_mode(self.folder))
+        old = None
+        if self.folder.exists():
+            old = self.folder.with_name(f".{self.folder.name}.old-{os.getpid()}")
+            os.replace(self.folder, old)
+        os.replace(self.tmp, self.folder)
+        if old is not None:
+            # Las subcarpetas de la anterior se mueven enteras a la nueva (un rename, sin copiar
+            # su contenido). Si alguna no se puede mover, la carpeta anterior queda sin borrar.
+            try:
+                for entry in old.iterdir():
+                    if entry.is_dir() and not (self.folder / entry.name).exists():
+                        os.replace(entry, self.folder / entry.name)
+            except OSError as e:
+                print(f"⚠️ No se pudieron pasar las subcarpetas de {self.folder} ({e}); quedan en {old}")
+            else:
+                shutil.rmtree(old, ignore_errors=True)
+        if self.reuse is not None:
+            # Solo las tablas de esta corrida; si alguien edita un CSV a mano, su tamaño o mtime
+            # ya no coinciden y la tabla se reescribe
+            self.reuse.clear()
+            for filename, digest in self.digests.items():
+                self.reuse[filename] = (digest, file_signature(self.folder / f"{filename}{self.suffix}"))
+
+    def abort(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def table_stats(self):
+        # Filas, bytes y segundos de escritura por CSV (después de commit)
+        stats = {}
+        for filename in sorted(self.written):
+            path = self.folder / f"{filename}{self.suffix}"
+            stats[filename] = {
+                'rows': self.rows.get(filename),
+                'bytes': path.stat().st_size if path.exists() else None,
+                'seconds': round(self.seconds[filename], 4) if filename in self.seconds else None,
+            }
+        return stats
+
+
+def write_dimension_csvs(output, state, token_resolver):
+    # ========== Poblar los CSVs de las tablas directory con los valores únicos e IDs usados ==========
+    for dimension in state.dimensions.values():
+        if dimension.headers is not None:
+            dimension.export(output)
+
+    schema = state.model.schema
+    # openshift_properties_directory.csv y pipeline_properties_directory.csv con todas las combinaciones
+    project = schema.tuple_projector('openshift_properties_directory', ('id',) + openshift_fields)
+    openshift_rows = [project((idx,) + combo) for combo, idx in openshift_combination_ids.items()]
+    output.write_rows('openshift_properties_directory.csv', schema.columns('openshift_properties_directory'),
+                      openshift_rows)
+    project = schema.tuple_projector('pipeline_properties_directory', ('id',) + pipeline_fields)
+    pipeline_rows = [project((idx,) + combo) for combo, idx in pipeline_combination_ids.items()]
+    output.write_rows('pipeline_properties_directory.csv', schema.columns('pipeline_properties_directory'),
+                      pipeline_rows)
+
+    # token_directory.csv con los valores de token.json
+    token_rows = []
+    for i, (token_name, token_value) in enumerate(token_resolver.by_name.items(), 1):
+        token_rows.append(state.model.project_token_row((
+            i if state.token_ids is None else state.token_ids.allocate(token_name),
+            token_value,
+            token_name,
+            token_resolver.namespaces[token_name],
+        )))
+    output.write_rows('token_directory.csv', schema.columns('token_directory'), token_rows)
+
+
+def run_streaming(output, state, sources, token_resolver, capacity=False):
+    # Modo --stream: las filas de hechos se escriben a medida que se producen y solo
+    # los mapas de dimensiones quedan en memoria. id_image_directory e id_drs_config se
+    # asignan en línea, en el mismo orden que la corrida completa. Diferencia conocida:
+    # si un mismo (archivo, proyecto, appName) aparece repetido, cada repetición master
+    # recibe su propio id_drs_config en lugar de compartir el último.
+    with output.stream_table('microservice_properties_directory.csv', state.ms_headers) as ms_writer, \
+            output.stream_table('app_general_properties.csv', state.model.app_headers) as general_writer, \
+            output.stream_table('microservice_drs_config.csv', state.model.drs_headers) as drs_writer:
+        general_id = drs_id = 0
+        quota_columns = QuotaColumns() if capacity else None
+        for ms_row, general_row in merge_records(state, (stream_source(p) for p in sources)):
+            ms_row.id_image_directory = state.image_id(ms_row.baseImageVersion)
+            if general_row.env == 'master':
+                drs_id = drs_id + 1 if state.drs_ids is None else state.drs_ids.allocate(ms_row.id)
+                drs_writer.writerow(state.model.project_drs_row((drs_id,) + general_row.record.drs))
+                ms_row.id_drs_config = drs_id
+            ms_writer.writerow(state.ms_row(ms_row))
+            general_id = general_id + 1 if state.general_ids is None else state.general_ids.allocate(ms_row.id)
+            general_row.id = general_id
+            general_row.id_pipeline_properties_directory = 1
+            general_row.id_pipeline_general_properties_directory = 1
+            general_writer.writerow(state.model.project_general_row(general_row))
+            if quota_columns is not None:
+                quota_columns.append(ms_row, general_row)
+    if quota_columns is not None:
+        write_capacity_tables(output, quota_columns)
+    write_dimension_csvs(output, state, token_resolver)
+
+
+# ========== TABLAS DE HECHOS ==========
+# Etapas de la corrida completa, separadas para poder medirlas por su cuenta (benchmark.py).
+
+def collect_rows(state, merged):
+    general_rows = []
+    microservice_rows = []
+    for ms_row, general_row in merged:
+        microservice_rows.append(ms_row)
+        general_rows.append(general_row)
+
+    # ========== LÓGICA PARA id_image_directory usando baseImageVersion ==========
+    for row in microservice_rows:
+        row.id_image_directory = state.image_id(row.baseImageVersion)
+    return microservice_rows, general_rows
+
+
+def build_app_general_rows(general_rows, general_ids=None, project_row=None):
+    # app_general_properties SOLO con los campos de la tabla SQL y los IDs correctos.
+    # Se proyecta a tuplas antes de que las etapas siguientes (pipeline, app_type)
+    # modifiquen las filas: el CSV refleja los valores de este momento.
+    project_row = project_row or model_tables().project_general_row
+    filtered_general_rows = []
+    for i, r in enumerate(general_rows, 1):
+        r.id = i if general_ids is None else general_ids.allocate(r.id_microservice_directory)
+        # Asignar id_pipeline_properties_directory según la combinación real
+        r.id_pipeline_properties_directory = r.id_pipeline_properties_directory or 1
+        r.id_pipeline_general_properties_directory = r.id_pipeline_properties_directory
+        filtered_general_rows.append(project_row(r))
+    return filtered_general_rows
+
 
 # Función para obtener el id de la combinación de pipeline para un microservicio
 # Si no se encuentra, retorna None
-
 def get_pipeline_id_for_microservice(securitygate, unittests, sonarqube, qualitygate):
     combo = (securitygate, unittests, sonarqube, qualitygate)
-    return pipeline_id_map.get(combo)
-
-# 2. En general_rows, asignar id_pipeline_properties_directory
-for row in general_rows:
-    # Aquí podrías detectar valores reales desde el JSON si existieran
-    row['id_pipeline_properties_directory'] = get_pipeline_id_for_microservice(True, True, True, True)
-
-# 3. Escribir pipeline_properties_directory.csv correctamente
-# (Ya se escribe correctamente arriba con el bucle for idx, combo in enumerate...)
-
-# ========== AJUSTE: Poblar app_type_directory.csv con el tipo de app del nombre del archivo JSON country-app_type.json ==========
-app_type_id_map = {}
-app_type_counter = 1
-for filename in os.listdir(json_folder):
-    if filename.endswith('.json') and '-' in filename and filename != token_file.name:
-        parts = filename.split('-')
-        if len(parts) > 1:
-            app_type = parts[1].replace('.json', '').replace('_', ' ').capitalize()
-            if app_type not in app_type_id_map:
-                app_type_id_map[app_type] = app_type_counter
-                app_type_counter += 1
-# Asignar id_app_type_directory a cada fila de general_rows
-for row in general_rows:
-    # Detectar app_type desde el nombre del proyecto (ejemplo: 'Argentina-MICROSERVICES.json' → 'Microsrvices')
-    project_name = row.get('project_name', '')
-    app_type = ''
-    for filename in os.listdir(json_folder):
-        if filename.endswith('.json') and filename != token_file.name and project_name.split()[0] in filename:
-            parts = filename.split('-')
-            if len(parts) > 1:
-                app_type = parts[1].replace('.json', '').replace('_', ' ').capitalize()
-                break
-    row['id_app_type_directory'] = app_type_id_map.get(app_type, '')
-    # Si no hay id_pipeline_properties_directory, usar 1 (todo True)
-    if not row.get('id_pipeline_properties_directory'):
-        row['id_pipeline_properties_directory'] = 1
-
-# 3. Escribir app_general_properties.csv con los campos ajustados
-with open(csv_folder / 'app_general_properties.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=app_headers_sql)
-    writer.writeheader()
-    writer.writerows(filtered_general_rows)
-
-# ========== NUEVO: Poblar token_directory.csv con los valores de token.json ==========
-token_rows = []
-for i, (token_name, token_value) in enumerate(token_map.items(), 1):
-    # Derivar namespace_name si es posible (por ejemplo, parte después de 'ocToken' y antes de env)
-    ns = token_name.replace('ocToken', '')
-    # Quitar sufijos de ambiente comunes
-    for env in ['dev', 'uat', 'prd']:
-        if ns.lower().endswith(env):
-            ns = ns[:-(len(env))]
-    namespace_name = ns if ns else ''
-    token_rows.append({
-        'id': i,
-        'token': token_value,
-        'token_name': token_name,
-        'namespace_name': namespace_name
-    })
-# Siempre sobrescribir y asegurar el orden correcto de columnas
-with open(csv_folder / 'token_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'token', 'token_name', 'namespace_name'])
-    writer.writeheader()
-    writer.writerows(token_rows)
-
-# ========== LÓGICA PARA id_image_directory usando baseImageVersion ==========
-image_id_map = {}
-image_counter = 1
-for row in microservice_rows:
-    base_image_version = row.get('baseImageVersion', '')
-    if base_image_version and base_image_version not in image_id_map:
-        image_id_map[base_image_version] = image_counter
-        image_counter += 1
-    row['id_image_directory'] = image_id_map.get(base_image_version, '')
-
-# Escribir image_directory.csv
-image_rows = []
-for name, id_ in image_id_map.items():
-    image_rows.append({'id': id_, 'image_name': name})
-with open(csv_folder / 'image_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'image_name'])
-    writer.writeheader()
-    writer.writerows(image_rows)
-
-# Escribir usage_directory.csv
-usage_rows = []
-for usage, id_ in usage_id_map.items():
-    usage_rows.append({'id': id_, 'usage': usage})
-with open(csv_folder / 'usage_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'usage'])
-    writer.writeheader()
-    writer.writerows(usage_rows)
-
-# ========== ESCRIBIR path_directory.csv CON LOS VALORES ÚNICOS DE MOUNTPATH EXTRAÍDOS ==========
-path_rows = []
-for path, id_ in path_id_map.items():
-    path_rows.append({'id': id_, 'volume_path': path})
-with open(csv_folder / 'path_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'volume_path'])
-    writer.writeheader()
-    writer.writerows(path_rows)
-
-# ========== LÓGICA PARA microservice_drs_config ==========
-ms_drs_config_rows = []
-ms_drs_config_id_map = {}
-ms_drs_config_counter = 1
-for r in microservice_rows:
-    drs_enabled = False
-    drs_token = ''
-    drs_namespace = ''
-    # Solo considerar ambiente de producción (master)
-    env_is_master = False
+    return pipeline_combination_ids.get(combo)
+
+
+def assign_default_pipeline_ids(general_rows):
+    # En general_rows, asignar id_pipeline_properties_directory
+    for row in general_rows:
+        # Aquí podrías detectar valores reales desde el JSON si existieran
+        row.id_pipeline_properties_directory = get_pipeline_id_for_microservice(True, True, True, True)
+
+
+def assign_app_types(general_rows, catalog=None):
+    # ========== AJUSTE: id_app_type_directory con el tipo de app del archivo country-app_type.json de cada fila ==========
+    # El tipo sale de la entrada del catálogo que trae cada fila (un solo recorrido de
+    # las carpetas), en lugar de listar json_folder por fila y buscar el proyecto en los nombres.
+    if catalog is None:
+        catalog = SourceCatalog.scan([json_folder], exclude_names=(token_file.name,))
+    for row in general_rows:
+        row.id_app_type_directory = catalog.app_type_id(row.source)
+        # Si no hay id_pipeline_properties_directory, usar 1 (todo True)
+        if not row.id_pipeline_properties_directory:
+            row.id_pipeline_properties_directory = 1
+
+
+def build_drs_config(microservice_rows, general_rows, drs_ids=None, project_row=None):
+    # ========== LÓGICA PARA microservice_drs_config ==========
+    # Índice de general_rows construido en una sola pasada:
+    #   (id_microservice_directory, env) -> primera fila general con esa clave
+    #   id_microservice_directory -> env de la primera fila general con ese id
+    # Reemplaza las búsquedas lineales sobre general_rows por cada microservicio (O(N²)).
+    model = model_tables()
+    project_row = project_row or model.project_ms_row
+    general_index = {}
+    ms_env_index = {}
     for g in general_rows:
-        if g.get('id_microservice_directory') == r['id'] and g.get('env') == 'master':
-            config_str = g.get('config', '')
-            config = {}
-            if isinstance(config_str, str):
-                try:
-                    config = json.loads(config_str)
-                except Exception:
-                    config = {}
-            if isinstance(config, dict):
-                drs_enabled = config.get('drsDeployEnable', False)
-                drs_token = config.get('drs_token', '')
-                drs_namespace = config.get('drs_namespace', '')
-            env_is_master = True
-            break
-    # Solo agregar fila si es ambiente master
-    if env_is_master:
-        ms_drs_config_rows.append({
-            'id': ms_drs_config_counter,
-            'drs_enabled': drs_enabled,
-            'drs_token': drs_token,
-            'drs_namespace': drs_namespace
-        })
-        ms_drs_config_id_map[r['id']] = ms_drs_config_counter
-        ms_drs_config_counter += 1
-    else:
-        ms_drs_config_id_map[r['id']] = ''  # No corresponde para no-master
-# Escribir microservice_drs_config.csv solo con los de master
-with open(csv_folder / 'microservice_drs_config.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['id', 'drs_enabled', 'drs_token', 'drs_namespace'])
-    writer.writeheader()
-    writer.writerows(ms_drs_config_rows)
-# ========== AJUSTE microservice_properties_directory: eliminar drs_enabled y agregar id_drs_config ==========
-ms_headers_sql = [
-    'id',
-    'id_usage_directory',
-    'cpulimits',
-    'cpurequest',
-    'memorylimits',
-    'memoryrequest',
-    'replicas',
-    'id_token_directory',
-    'id_openshift_properties_directory',
-    'id_path_directory',
-    'id_image_directory',
-    'id_drs_config',
-]
-filtered_microservice_rows = []
-for r in microservice_rows:
-    filtered_row = {k: r.get(k, '') for k in ms_headers_sql if k != 'id_drs_config'}
-    # Solo asignar id_drs_config si el microservicio es master y tiene id asignado
-    id_drs = ms_drs_config_id_map.get(r['id'], '')
-    # Buscar el ambiente correspondiente en general_rows
-    env = None
+        ms_id = g.id_microservice_directory
+        general_index.setdefault((ms_id, g.env), g)
+        ms_env_index.setdefault(ms_id, g.env)
+
+    ms_drs_config_rows = []
+    ms_drs_config_id_map = {}
+    ms_drs_config_counter = 1
+    for r in microservice_rows:
+        # Solo considerar ambiente de producción (master)
+        g = general_index.get((r.id, 'master'))
+        if g is not None:
+            # Solo agregar fila si es ambiente master: (id, drs_enabled, drs_token, drs_namespace)
+            drs_id = ms_drs_config_counter if drs_ids is None else drs_ids.allocate(r.id)
+            ms_drs_config_rows.append(model.project_drs_row((drs_id,) + g.record.drs))
+            ms_drs_config_id_map[r.id] = drs_id
+            ms_drs_config_counter += 1
+        else:
+            ms_drs_config_id_map[r.id] = ''  # No corresponde para no-master
+
+    # ========== AJUSTE microservice_properties_directory: eliminar drs_enabled y agregar id_drs_config ==========
+    for r in microservice_rows:
+        # Solo asignar id_drs_config si el microservicio es master y tiene id asignado
+        id_drs = ms_drs_config_id_map.get(r.id, '')
+        # Buscar el ambiente correspondiente en el índice de general_rows
+        env = ms_env_index.get(r.id)
+        if env == 'master' and id_drs:
+            r.id_drs_config = id_drs
+        else:
+            r.id_drs_config = ''
+    # microservice_drs_config solo con los de master
+    return ms_drs_config_rows, [project_row(r) for r in microservice_rows]
+
+
+def map_pipeline_ids(general_rows):
+    # ========== ASIGNAR id_pipeline_properties_directory SEGÚN VALORES REALES DEL MICROSERVICIO ==========
+    # Para cada microservicio, buscar en su config los valores de securitygate, unittests, sonarqube, qualitygate
+    # Si no existen, usar True por defecto
+    pipeline_id_map_micro = {}
     for g in general_rows:
-        if g.get('id_microservice_directory') == r['id']:
-            env = g.get('env')
-            break
-    if env == 'master' and id_drs:
-        filtered_row['id_drs_config'] = id_drs
+        securitygate, unittests, sonarqube, qualitygate = g.record.pipeline_flags
+        pipeline_id = get_pipeline_id_for_microservice(securitygate, unittests, sonarqube, qualitygate)
+        if pipeline_id is None:
+            print(f"⚠️ Combinación de pipeline no encontrada para microservicio {g.record.appName}, usando id=1")
+            pipeline_id = 1
+        # Corregir la clave: debe ser 'id_microservice_directory' (no 'id_microservicio_directory')
+        pipeline_id_map_micro[g.id_microservice_directory] = pipeline_id
+    return pipeline_id_map_micro
+
+
+def build_fact_tables(output, state, merged, metrics=None, capacity=False):
+    metrics = metrics or RunMetrics()
+    with metrics.stage('dimensions') as m:
+        microservice_rows, general_rows = collect_rows(state, merged)
+        m['rows_out'] = len(microservice_rows)
+    with metrics.stage('app_general', rows_in=len(general_rows)) as m:
+        app_general_rows = build_app_general_rows(general_rows, state.general_ids,
+                                                  state.model.project_general_row)
+        output.write_rows('app_general_properties.csv', state.model.app_headers, app_general_rows)
+        m['rows_out'] = len(app_general_rows)
+    with metrics.stage('pipeline_ids', rows_in=len(general_rows)):
+        assign_default_pipeline_ids(general_rows)
+    with metrics.stage('app_type', rows_in=len(general_rows)):
+        assign_app_types(general_rows, state.catalog)
+    with metrics.stage('drs', rows_in=len(microservice_rows)) as m:
+        drs_rows, filtered_microservice_rows = build_drs_config(microservice_rows, general_rows, state.drs_ids,
+                                                                state.ms_row)
+        output.write_rows('microservice_drs_config.csv', state.model.drs_headers, drs_rows)
+        output.write_rows('microservice_properties_directory.csv', state.ms_headers, filtered_microservice_rows)
+        m['rows_out'] = len(drs_rows)
+    with metrics.stage('pipeline_ids', rows_in=len(general_rows)) as m:
+        pipeline_id_map_micro = map_pipeline_ids(general_rows)
+        m['rows_out'] = len(pipeline_id_map_micro)
+    if capacity:
+        # Cuotas numéricas y resumen de capacidad por país/ambiente (--capacity)
+        with metrics.stage('capacity', rows_in=len(microservice_rows)) as m:
+            m['rows_out'] = write_capacity_tables(output, QuotaColumns.from_rows(microservice_rows, general_rows))[1]
+    return pipeline_id_map_micro
+
+
+def write_delta_folder(folder, previous, current_folder):
+    delta_output = OutputStage(folder, snapshot=False)
+    try:
+        changes = write_delta(delta_output, previous, read_snapshot(current_folder))
+        delta_output.commit()
+    except BaseException:
+        delta_output.abort()
+        raise
+    total = 0
+    for table, (_, inserts, updates, deletes) in changes.items():
+        print(f"  {table}: +{len(inserts)} ~{len(updates)} -{len(deletes)}")
+        total += len(inserts) + len(updates) + len(deletes)
+    print(f"Delta: {total} filas cambiadas en {len(changes)} tablas, guardado en {folder}")
+    return total
+
+
+def print_token_stats(token_resolver):
+    stats = token_resolver.stats()
+    print(f"Tokens: {stats['entries']} en token.json ({stats['base_names']} nombres base); tokenOcp sin id exacto: "
+          f"{stats['exact']} con el mismo nombre, {stats['folded']} sin distinguir mayúsculas, "
+          f"{stats['env']} por ambiente, {stats['missing']} sin token")
+
+
+def read_token_id_map(folder):
+    # id_token_directory por tokenname, tomado del token_directory.csv de la corrida anterior
+    token_id_map = {}
+    path = find_table(folder, 'token_directory')
+    if path is not None:
+        with open_text(path) as f:
+            for row in csv.DictReader(f):
+                token_id_map[row['token_name']] = int(row['id'])
+    return token_id_map
+
+
+# ========== MÉTRICAS (--metrics / --profile) ==========
+# Por etapa: tiempo de pared, filas de entrada y salida. Al final: tamaño de cada mapa de
+# dimensiones, filas/bytes/segundos por CSV y pico de memoria (RSS) del proceso y de los
+# workers. --metrics guarda todo en un JSON; --profile agrega cProfile y tracemalloc.
+
+class RunMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'rows_in': None, 'rows_out': None})
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        # Una etapa que se repite (pipeline_ids) acumula tiempo y conserva las últimas filas
+        entry = self._stage(name)
+        if rows_in is not None:
+            entry['rows_in'] = rows_in
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] += time.perf_counter() - start
+
+    def timed(self, name, iterable):
+        # Mide solo el tiempo que pasa dentro del iterable (p. ej. la ingesta consumida por merge_records)
+        entry = self._stage(name)
+        entry['rows_out'] = 0
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                entry['seconds'] += time.perf_counter() - start
+                return
+            entry['seconds'] += time.perf_counter() - start
+            entry['rows_out'] += 1
+            yield item
+
+    def report(self, state, output):
+        # resource solo existe en Unix: en Windows los picos de RSS quedan en None
+        try:
+            import resource
+        except ImportError:
+            peak_self = peak_children = None
+        else:
+            # ru_maxrss está en KB en Linux
+            peak_self = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            peak_children = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+        dimensions = {table: len(dimension) for table, dimension in state.dimensions.items()}
+        dimensions['token_id_map'] = len(state.token_id_map)
+        return {
+            'total_seconds': round(time.perf_counter() - self.start, 4),
+            'stages': {name: dict(entry, seconds=round(entry['seconds'], 4)) for name, entry in self.stages.items()},
+            'dimensions': dimensions,
+            'tables': output.table_stats(),
+            'peak_rss_mb': peak_self,
+            'peak_rss_workers_mb': peak_children,
+        }
+
+
+def profile_summary(profiler, limit=25):
+    # Funciones más costosas (tiempo acumulado) y sitios con más memoria viva al terminar
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ])
+    allocations = [{'site': str(stat.traceback), 'kb': round(stat.size / 1024, 1), 'count': stat.count}
+                   for stat in snapshot.statistics('lineno')[:10]]
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer).sort_stats('cumulative')
+    stats.print_stats(limit)
+    hottest = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]:
+        hottest.append({'function': f"{Path(filename).name}:{line}({function})", 'calls': calls,
+                        'own_seconds': round(own, 4), 'cumulative_seconds': round(cumulative, 4)})
+    return buffer.getvalue(), {
+        'hottest_functions': hottest,
+        'tracemalloc_peak_mb': round(peak / 2**20, 1),
+        'top_allocations': allocations,
+    }
+
+
+# ========== API ==========
+# Importar jsontocsv no crea carpetas ni lee archivos: todo pasa dentro de build_catalog,
+# que arma su propio estado (IngestState, TokenResolver, salida) en cada llamada, así que
+# se puede llamar varias veces desde un mismo proceso (tests, un servicio) sin que una
+# corrida vea datos de otra:
+#   import jsontocsv
+#   report = jsontocsv.build_catalog(['exports'], 'exports/token.json', 'csv_output')
+# input_dirs: carpetas / patrones glob como --input, o un SourceCatalog ya armado.
+# Devuelve el reporte de --metrics, o None si con incremental=True no había cambios.
+# El único estado global es el backend JSON (jsonbackend.use_backend).
+
+def check_options(stream=False, incremental=False, load_db=None, delta=None, compression=None, watch=False):
+    if watch and (stream or incremental or load_db or delta):
+        raise ValueError('--watch no se puede combinar con --stream, --incremental, --load-db ni --delta')
+    if stream and incremental:
+        raise ValueError('--stream no se puede combinar con --incremental')
+    if load_db and stream:
+        raise ValueError('--load-db no se puede combinar con --stream')
+    if load_db and delta:
+        raise ValueError('--load-db no se puede combinar con --delta (upsert.sql es la carga incremental)')
+    if compression and (load_db or delta):
+        raise ValueError('--compress no se puede combinar con --load-db ni con --delta')
+    if compression is not None and compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compresión desconocida: {compression} (opciones: {', '.join(sorted(COMPRESSION_SUFFIXES))})")
+    if compression == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ValueError('--compress zstd requiere zstandard (pip install zstandard)')
+
+
+def build_catalog(input_dirs=(json_folder,), token_file=token_file, output=csv_folder, workers=1, stream=False,
+                  incremental=False, cache=cache_folder, load_db=None, delta=None, capacity=False,
+                  write_workers=1, compression=None, verbose=False, quota_profiles=False):
+    check_options(stream, incremental, load_db, delta, compression)
+    token_file, output_folder = Path(token_file), Path(output)
+    if isinstance(input_dirs, SourceCatalog):
+        catalog = input_dirs
     else:
-        filtered_row['id_drs_config'] = ''
-    filtered_microservice_rows.append(filtered_row)
-with open(csv_folder / 'microservice_properties_directory.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=ms_headers_sql)
-    writer.writeheader()
-    writer.writerows(filtered_microservice_rows)
-
-# ========== ASIGNAR id_pipeline_properties_directory SEGÚN VALORES REALES DEL MICROSERVICIO ==========
-# Para cada microservicio, buscar en su config los valores de securitygate, unittests, sonarqube, qualitygate
-# Si no existen, usar True por defecto
-pipeline_id_map_micro = {}
-for g in general_rows:
-    config = g.get('config', {})
-    if isinstance(config, str):
+        catalog = SourceCatalog.scan(input_dirs, exclude_names=(token_file.name,))
+    sources = catalog.paths
+    manifest = None
+    if incremental:
+        manifest = BuildManifest(cache, {'capacity': capacity, 'quota_profiles': quota_profiles,
+                                         'compression': compression, 'json_backend': current_backend()})
+    # Con load_db el manifiesto solo se usa como caché de parseo: la carpeta de salida no se toca.
+    # Con delta se corre igual, para que la carpeta de cambios quede vacía.
+    if (manifest is not None and not load_db and not delta
+            and manifest.up_to_date(sources, token_file, output_folder)):
+        print(f"Sin cambios en las entradas: {output_folder} está al día.")
+        return None
+
+    # Cargar tokens (nuevo formato: lista de objetos)
+    token_list = load_file(token_file)
+    token_resolver = TokenResolver(token_list)
+
+    metrics = RunMetrics()
+    state = IngestState(read_token_id_map(output_folder), openshift_combination_ids, verbose=verbose,
+                        catalog=catalog, quota_profiles=quota_profiles, token_resolver=token_resolver)
+    previous = None
+    if delta:
+        with metrics.stage('previous_snapshot') as m:
+            previous = read_snapshot(output_folder)
+            # Las columnas de microservice_properties_directory dependen de --quota-profiles:
+            # contra una foto generada con el otro formato el upsert no sería válido
+            previous_ms_headers = previous.get('microservice_properties_directory', (None,))[0]
+            if previous_ms_headers is not None and previous_ms_headers != list(state.ms_headers):
+                raise SystemExit(f"{output_folder / 'microservice_properties_directory.csv'} tiene otras columnas "
+                                 f"que esta corrida ({'con' if quota_profiles else 'sin'} --quota-profiles): "
+                                 f"regenerar {output_folder} sin --delta antes de calcular cambios")
+            state.keep_ids(previous_ids(previous, state.dimensions))
+            m['rows_out'] = sum(len(rows) for _, rows in previous.values())
+    if load_db:
+        output = DatabaseLoader(load_db)
+    else:
+        output = OutputStage(output_folder, workers=write_workers, compression=compression)
+    try:
+        if stream:
+            with metrics.stage('stream', rows_in=len(sources)):
+                run_streaming(output, state, sources, token_resolver, capacity)
+        else:
+            results = metrics.timed('ingest', ingest(sources, workers, manifest))
+            build_fact_tables(output, state, merge_records(state, results), metrics, capacity)
+            # El tiempo de la ingesta corre mientras merge_records la consume: se descuenta de 'dimensions'
+            metrics.stages['dimensions']['seconds'] -= metrics.stages['ingest']['seconds']
+            metrics.stages['ingest']['rows_in'] = len(sources)
+            with metrics.stage('dimension_tables'):
+                write_dimension_csvs(output, state, token_resolver)
+        if previous is not None:
+            # La carpeta de cambios se confirma antes que la salida: si algo falla en el medio,
+            # la próxima corrida vuelve a calcular los mismos cambios contra la foto anterior
+            with metrics.stage('delta') as m:
+                output.flush()
+                m['rows_out'] = write_delta_folder(delta, previous, output.tmp)
+        with metrics.stage('commit'):
+            output.commit()
+    except BaseException:
+        output.abort()
+        raise
+
+    if manifest is not None and not load_db:
+        manifest.save(sources, token_file, output_folder)
+    print_token_stats(token_resolver)
+    return metrics.report(state, output)
+
+
+# ========== MODO --watch ==========
+# Proceso que queda corriendo y regenera la carpeta de salida cada vez que cambia una
+# entrada o token.json. Entre corridas conserva en memoria las filas aplanadas de cada
+# archivo (solo se vuelve a parsear el que cambió de tamaño o mtime), el índice de
+# tokens y la huella de cada tabla escrita (solo se reescriben las tablas que cambiaron;
+# las demás se enlazan). Los ids se vuelven a asignar en cada corrida sobre las filas ya
+# parseadas, porque dependen del orden de todos los archivos: la salida es la misma que
+# la de una corrida completa. Un cambio se procesa cuando las entradas dejan de
+# cambiar durante WATCH_DEBOUNCE segundos (un editor que guarda en varias escrituras
+# dispara una sola regeneración).
+
+WATCH_INTERVAL = 0.2
+WATCH_DEBOUNCE = 0.3
+
+
+class WarmBuild:
+    def __init__(self, token_file, output, capacity=False, write_workers=1, compression=None, verbose=False,
+                 quota_profiles=False):
+        self.token_file = Path(token_file)
+        self.output_folder = Path(output)
+        self.capacity = capacity
+        self.write_workers = write_workers
+        self.compression = compression
+        self.verbose = verbose
+        self.quota_profiles = quota_profiles
+        self.parsed = {}  # ruta -> ((tamaño, mtime_ns), resultado de parse_source)
+        self.token_signature = None
+        self.token_resolver = None
+        self.digests = {}  # huellas de las tablas escritas (OutputStage reuse)
+
+    def build(self, catalog):
+        # Regenera la salida; devuelve (archivos parseados, tablas reescritas)
+        token_signature = file_signature(self.token_file)
+        if self.token_resolver is None or token_signature != self.token_signature:
+            self.token_resolver = TokenResolver(load_file(self.token_file))
+            self.token_signature = token_signature
+        parsed, results, reparsed = {}, [], 0
+        for entry in catalog.entries:
+            signature = (entry.size, entry.mtime_ns)
+            cached = self.parsed.get(entry.path)
+            if cached is None or cached[0] != signature:
+                cached = (signature, parse_source(entry.path))
+                reparsed += 1
+            parsed[entry.path] = cached
+            results.append(cached[1])
+        state = IngestState(read_token_id_map(self.output_folder), openshift_combination_ids,
+                            verbose=self.verbose, catalog=catalog, quota_profiles=self.quota_profiles,
+                            token_resolver=self.token_resolver)
+        output = OutputStage(self.output_folder, workers=self.write_workers, compression=self.compression,
+                             reuse=self.digests)
         try:
-            config = json.loads(config)
-        except Exception:
-            config = {}
-    securitygate = config.get('securitygate', True)
-    unittests = config.get('unittests', True)
-    sonarqube = config.get('sonarqube', True)
-    qualitygate = config.get('qualitygate', True)
-    pipeline_id = get_pipeline_id_for_microservice(securitygate, unittests, sonarqube, qualitygate)
-    if pipeline_id is None:
-        print(f"⚠️ Combinación de pipeline no encontrada para microservicio {g.get('appName')}, usando id=1")
-        pipeline_id = 1
-    # Corregir la clave: debe ser 'id_microservice_directory' (no 'id_microservicio_directory')
-    pipeline_id_map_micro[g['id_microservice_directory']] = pipeline_id
\ No newline at end of file
+            build_fact_tables(output, state, merge_records(state, results), capacity=self.capacity)
+            write_dimension_csvs(output, state, self.token_resolver)
+            output.commit()
+        except BaseException:
+            output.abort()
+            raise
+        # Los archivos que desaparecieron de las entradas salen de la memoria
+        self.parsed = parsed
+        return reparsed, len(output.written) - len(output.reused)
+
+
+def watch_signature(catalog, token_file):
+    return tuple((str(e.path), e.size, e.mtime_ns) for e in catalog.entries), file_signature(token_file)
+
+
+def watch(input_dirs=(json_folder,), token_file=token_file, output=csv_folder, interval=WATCH_INTERVAL,
+          debounce=WATCH_DEBOUNCE, exclude_paths=(), **options):
+    # options: capacity, write_workers, compression, verbose, quota_profiles (como build_catalog)
+    token_file = Path(token_file)
+    warm = WarmBuild(token_file, output, **options)
+    built = None  # firma de las entradas de la última regeneración
+    pending, since = None, 0.0
+    print(f"Observando {', '.join(str(i) for i in input_dirs)} y {token_file} (Ctrl+C para terminar)")
+    try:
+        while True:
+            try:
+                catalog = SourceCatalog.scan(input_dirs, exclude_names=(token_file.name,),
+                                             exclude_paths=exclude_paths)
+                signature = watch_signature(catalog, token_file)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ No se pudieron listar las entradas: {e}")
+                time.sleep(interval)
+                continue
+            now = time.monotonic()
+            if signature != pending:
+                pending, since = signature, now
+            # La primera corrida no espera; las siguientes, a que las entradas se estabilicen
+            if signature != built and (built is None or now - since >= debounce):
+                start = time.perf_counter()
+                try:
+                    reparsed, rewritten = warm.build(catalog)
+                except Exception as e:
+                    # token.json inválido o un archivo borrado a mitad de la lectura: se espera al próximo cambio
+                    print(f"⚠️ Error al regenerar {output}: {e}")
+                else:
+                    print(f"Regenerado {output} en {time.perf_counter() - start:.2f}s: "
+                          f"{reparsed} archivo(s) parseado(s), {rewritten} tabla(s) reescrita(s)")
+                built = signature
+            elif signature != built:
+                time.sleep(min(interval, max(0.0, debounce - (now - since))))
+                continue
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convierte los JSON de microservicios a CSVs del modelo.sql')
+    parser.add_argument('--input', action='append', metavar='RUTA',
+                        help='Carpeta o patrón glob (** recorre subcarpetas) con los JSON de entrada; '
+                             'se puede repetir (por defecto la carpeta actual)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos para parsear los archivos de entrada en paralelo (por defecto 1, serial)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--stream', action='store_true',
+                      help='Leer los JSON de forma incremental y escribir las filas a medida que se generan '
+                           '(memoria acotada por los mapas de dimensiones)')
+    mode.add_argument('--incremental', action='store_true',
+                      help=f'Reutilizar las filas de los archivos sin cambios (manifiesto en {cache_folder})')
+    parser.add_argument('--load-db', metavar='DSN',
+                        help='Cargar las tablas directo en la base de modelo.sql en lugar de escribir CSVs '
+                             '(sqlite:///archivo.db o postgresql://...)')
+    parser.add_argument('--delta', nargs='?', const='csv_delta', metavar='CARPETA',
+                        help=f'Conservar los ids de {csv_folder} y escribir en CARPETA (por defecto csv_delta) '
+                             'solo las filas insertadas, modificadas y borradas, más upsert.sql')
+    parser.add_argument('--watch', action='store_true',
+                        help='Quedar observando las entradas y token.json y regenerar la salida con cada cambio '
+                             '(solo se vuelven a parsear los archivos modificados)')
+    parser.add_argument('--capacity', action='store_true',
+                        help='Agregar microservice_quota_numeric.csv (cpu en millicores, memoria en bytes) y '
+                             'capacity_by_country_env.csv (totales por país y ambiente, por replicas)')
+    parser.add_argument('--quota-profiles', action='store_true',
+                        help='Guardar cada combinación distinta de cpu/memoria/replicas una sola vez en '
+                             'quota_profile_directory.csv y referenciarla desde microservice_properties_directory')
+    parser.add_argument('--write-workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Hilos para escribir las tablas en paralelo (por defecto hasta 4, según los núcleos)')
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES),
+                        help='Escribir las tablas comprimidas (<tabla>.csv.gz o .csv.zst; zstd requiere zstandard)')
+    parser.add_argument('--json-backend', choices=('auto',) + BACKENDS, default='auto',
+                        help='Parser JSON: orjson si está instalado (auto) o json de la biblioteca estándar')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Mostrar cada proyecto y microservicio procesado')
+    parser.add_argument('--metrics', metavar='ARCHIVO',
+                        help='Guardar métricas por etapa (tiempos, filas, mapas, bytes por CSV, pico de RSS) en JSON')
+    parser.add_argument('--profile', action='store_true',
+                        help='Ejecutar con cProfile y tracemalloc y mostrar las funciones más costosas')
+    args = parser.parse_args()
+    try:
+        check_options(stream=args.stream, incremental=args.incremental, load_db=args.load_db,
+                      delta=args.delta, compression=args.compress, watch=args.watch)
+        use_backend(args.json_backend)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.watch:
+        if args.profile or args.metrics:
+            parser.error('--watch no se puede combinar con --profile ni --metrics')
+        watch(args.input or [json_folder], token_file, csv_folder, capacity=args.capacity,
+              write_workers=args.write_workers, compression=args.compress, verbose=args.verbose,
+              quota_profiles=args.quota_profiles)
+        return
+
+    # El reporte de --metrics es un .json: si se guarda junto a las entradas no debe tomarse como una
+    # entrada
+    try:
+        catalog = SourceCatalog.scan(args.input or [json_folder], exclude_names=(token_file.name,),
+                                     exclude_paths=[args.metrics] if args.metrics else ())
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    profiler = None
+    if args.profile:
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        report = build_catalog(catalog, token_file, csv_folder, workers=args.workers, stream=args.stream,
+                               incremental=args.incremental, load_db=args.load_db, delta=args.delta,
+                               capacity=args.capacity, write_workers=args.write_workers,
+                               compression=args.compress, verbose=args.verbose,
+                               quota_profiles=args.quota_profiles)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    if report is None:
+        return
+
+    if profiler is not None:
+        text, report['profile'] = profile_summary(profiler)
+        tracemalloc.stop()
+        print(text)
+        print(f"Pico de memoria (tracemalloc): {report['profile']['tracemalloc_peak_mb']} MB")
+        for allocation in report['profile']['top_allocations']:
+            print(f"  {allocation['kb']:>10} KB  {allocation['site']}")
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Métricas guardadas en {args.metrics}")
+    peak = f"{report['peak_rss_mb']} MB" if report['peak_rss_mb'] is not None else 'no disponible'
+    print(f"Tiempo total: {report['total_seconds']:.2f}s, pico de memoria: {peak}")
+
+if __name__ == '__main__':
+    main()
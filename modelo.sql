@@ -4,6 +4,7 @@
 
 DROP TABLE IF EXISTS app_general_properties;
 DROP TABLE IF EXISTS microservice_properties_directory;
+DROP TABLE IF EXISTS microservice_drs_config;
 DROP TABLE IF EXISTS datastage_properties_directory;
 DROP TABLE IF EXISTS database_properties_directory;
 DROP TABLE IF EXISTS was_properties_directory;
@@ -24,6 +25,7 @@ DROP TABLE IF EXISTS token_directory;
 DROP TABLE IF EXISTS openshift_properties_directory;
 DROP TABLE IF EXISTS path_directory;
 DROP TABLE IF EXISTS image_directory;
+DROP TABLE IF EXISTS quota_profile_directory;
 
 
 -- ===============================
@@ -33,6 +35,7 @@ DROP TABLE IF EXISTS image_directory;
 CREATE TABLE project_directory (
     id SERIAL PRIMARY KEY,
     project_name VARCHAR(100) NOT NULL, -- project_name (JSON: project_name)
+    project_acronym VARCHAR(100) -- (No existe en JSON, puedes derivar o dejar vacío)
 );
 
 CREATE TABLE appname_directory (
@@ -123,6 +126,16 @@ CREATE TABLE path_directory (
     volume_path VARCHAR(100) -- mountPath (JSON: config.volumes[].mountPath)
 );
 
+-- Perfiles de cuota compartidos (jsontocsv.py --quota-profiles)
+CREATE TABLE quota_profile_directory (
+    id SERIAL PRIMARY KEY,
+    cpulimits VARCHAR(100),
+    cpurequest VARCHAR(100),
+    memorylimits VARCHAR(100),
+    memoryrequest VARCHAR(100),
+    replicas INT
+);
+
 CREATE TABLE microservice_drs_config (
     id SERIAL PRIMARY KEY,
     drs_enabled BOOLEAN NOT NULL DEFAULT false,
@@ -133,6 +146,7 @@ CREATE TABLE microservice_drs_config (
 CREATE TABLE microservice_properties_directory (
     id SERIAL PRIMARY KEY,
     id_usage_directory INT REFERENCES usage_directory(id),
+    id_quota_profile_directory INT REFERENCES quota_profile_directory(id), -- con --quota-profiles reemplaza a las 5 columnas de cuota
     cpulimits VARCHAR(100),
     cpurequest VARCHAR(100),
     memorylimits VARCHAR(100),
@@ -177,6 +191,7 @@ CREATE TABLE app_general_properties (
     id_app_type_directory INT REFERENCES app_type_directory(id),
     id_pipeline_properties_directory INT REFERENCES pipeline_properties_directory(id),
     id_pipeline_general_properties_directory INT REFERENCES pipeline_properties_directory(id),    
+    id_runtime_directory INT REFERENCES runtime_directory(id),
     sonarqubepath_exec VARCHAR(100), -- (No existe en JSON)
     id_microservice_directory INT REFERENCES microservice_properties_directory(id),
     id_datastage_properties_directory INT REFERENCES datastage_properties_directory(id),
@@ -0,0 +1,170 @@
+import math
+import re
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa la misma lógica con listas
+    np = None
+
+# Normalización numérica de las cuotas (resQuotasdev/qa/master) de cada fila de
+# microservice_properties_directory: cpu en millicores, memoria en bytes y replicas
+# como entero, más un resumen de capacidad por país y ambiente (cpu y memoria
+# multiplicadas por replicas). Los valores repetidos son la norma ("500m", "1Gi"),
+# así que cada columna se factoriza en valores únicos, se parsea una vez cada valor
+# distinto y el resultado se expande a todas las filas; con NumPy la expansión y las
+# sumas por grupo son operaciones sobre arreglos.
+
+NUMERIC_HEADERS = ['id', 'cpulimits_millicores', 'cpurequest_millicores', 'memorylimits_bytes',
+                   'memoryrequest_bytes', 'replicas']
+ROLLUP_HEADERS = ['country', 'env', 'microservices', 'replicas', 'cpu_request_millicores',
+                  'cpu_limit_millicores', 'memory_request_bytes', 'memory_limit_bytes', 'unparsed']
+
+QUANTITY_RE = re.compile(r'^\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([A-Za-z]*)\s*$')
+CPU_UNITS = {'': 1000, 'm': 1, 'u': 1e-3, 'n': 1e-6, 'k': 1e6}
+MEMORY_UNITS = {
+    '': 1, 'k': 10**3, 'K': 10**3, 'M': 10**6, 'G': 10**9, 'T': 10**12, 'P': 10**15, 'E': 10**18,
+    'Ki': 2**10, 'Mi': 2**20, 'Gi': 2**30, 'Ti': 2**40, 'Pi': 2**50, 'Ei': 2**60, 'm': 1e-3,
+}
+
+
+# ========== PARSEO DE CANTIDADES ==========
+
+def parse_quantity(value, units):
+    # Cantidad de Kubernetes ("500m", "2Gi", "0.5", 2) en la unidad base de units; None si no se entiende
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * units['']
+    match = QUANTITY_RE.match(str(value))
+    if not match or match.group(2) not in units:
+        return None
+    return float(match.group(1)) * units[match.group(2)]
+
+
+def parse_cpu(value):
+    return parse_quantity(value, CPU_UNITS)
+
+
+def parse_memory(value):
+    return parse_quantity(value, MEMORY_UNITS)
+
+
+def parse_replicas(value):
+    try:
+        return float(int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def factorize(values):
+    # (código por fila, valores únicos en orden de aparición)
+    index = {}
+    codes = [index.setdefault(v, len(index)) for v in values]
+    return codes, list(index)
+
+
+# ========== COLUMNAS ==========
+
+class QuotaColumns:
+    # Cuotas crudas en columnas (una lista por campo), acumuladas fila a fila en
+    # --stream o armadas de una vez a partir de las filas en memoria
+    FIELDS = ('cpulimits', 'cpurequest', 'memorylimits', 'memoryrequest', 'replicas')
+
+    def __init__(self):
+        self.ids = []
+        self.groups = []  # (país, ambiente)
+        self.raw = {field: [] for field in self.FIELDS}
+
+    def append(self, ms_row, general_row):
+        self.ids.append(ms_row.id)
+        self.groups.append((general_row.record.country, general_row.env))
+        for field in self.FIELDS:
+            self.raw[field].append(getattr(ms_row, field))
+
+    @classmethod
+    def from_rows(cls, microservice_rows, general_rows):
+        # microservice_rows y general_rows van en paralelo (merge_records produce pares)
+        columns = cls()
+        for ms_row, general_row in zip(microservice_rows, general_rows):
+            columns.append(ms_row, general_row)
+        return columns
+
+    def __len__(self):
+        return len(self.ids)
+
+
+PARSERS = {
+    'cpulimits': parse_cpu,
+    'cpurequest': parse_cpu,
+    'memorylimits': parse_memory,
+    'memoryrequest': parse_memory,
+    'replicas': parse_replicas,
+}
+
+
+def normalize(columns, use_numpy=None):
+    # Columna numérica por campo: arreglo float64 con NaN (NumPy) o lista con None
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    numeric = {}
+    for field, parser in PARSERS.items():
+        codes, uniques = factorize(columns.raw[field])
+        parsed = [parser(v) for v in uniques]
+        if use_numpy:
+            lookup = np.array([math.nan if v is None else v for v in parsed], dtype=np.float64)
+            numeric[field] = lookup[np.asarray(codes, dtype=np.intp)] if codes else np.empty(0)
+        else:
+            numeric[field] = [parsed[c] for c in codes]
+    return numeric
+
+
+def rollup(columns, numeric):
+    # [(país, ambiente, microservicios, replicas, cpu req, cpu lim, mem req, mem lim, no parseadas)]
+    # cpu y memoria multiplicadas por replicas; una fila con algún valor no parseable
+    # cuenta en 'unparsed' y aporta 0 en ese campo
+    codes, groups = factorize(columns.groups)
+    fields = ('replicas', 'cpurequest', 'cpulimits', 'memoryrequest', 'memorylimits')
+    if isinstance(numeric['replicas'], list):
+        totals = [[0, 0.0, 0.0, 0.0, 0.0, 0.0, 0] for _ in groups]
+        for i, code in enumerate(codes):
+            values = [numeric[field][i] for field in fields]
+            replicas = values[0] or 0
+            total = totals[code]
+            total[0] += 1
+            total[1] += replicas
+            for j, value in enumerate(values[1:], 2):
+                total[j] += (value or 0) * replicas
+            total[6] += any(v is None for v in values)
+    else:
+        codes = np.asarray(codes, dtype=np.intp)
+        size = len(groups)
+        replicas = np.nan_to_num(numeric['replicas'])
+        sums = [np.bincount(codes, minlength=size), np.bincount(codes, weights=replicas, minlength=size)]
+        for field in fields[1:]:
+            sums.append(np.bincount(codes, weights=np.nan_to_num(numeric[field]) * replicas, minlength=size))
+        unparsed = np.zeros(len(codes), dtype=bool)
+        for field in fields:
+            unparsed |= np.isnan(numeric[field])
+        sums.append(np.bincount(codes, weights=unparsed, minlength=size))
+        totals = [[column[g] for column in sums] for g in range(size)]
+    return [(country, env, *(cell(v) for v in total)) for (country, env), total in zip(groups, totals)]
+
+
+def cell(value):
+    # Valor para CSV: vacío si falta, entero si no tiene decimales
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 3)
+
+
+def write_capacity_tables(output, columns, use_numpy=None):
+    numeric = normalize(columns, use_numpy)
+    fields = ('cpulimits', 'cpurequest', 'memorylimits', 'memoryrequest', 'replicas')
+    numeric_rows = [
+        (ms_id, *(cell(numeric[field][i]) for field in fields))
+        for i, ms_id in enumerate(columns.ids)
+    ]
+    output.write_rows('microservice_quota_numeric.csv', NUMERIC_HEADERS, numeric_rows)
+    rollup_rows = rollup(columns, numeric)
+    output.write_rows('capacity_by_country_env.csv', ROLLUP_HEADERS, rollup_rows)
+    return len(numeric_rows), len(rollup_rows)
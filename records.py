@@ -0,0 +1,115 @@
+# Registros de filas del pipeline de jsontocsv.py. Viven en un módulo propio e
+# importable para que los registros que devuelven los procesos de --workers (pickle)
+# se resuelvan igual corriendo jsontocsv.py como script o importándolo (build_catalog).
+
+
+# ========== REGISTROS DE FILAS ==========
+# Una fila por microservicio aplanado y por (microservicio, ambiente) en clases con
+# __slots__ en lugar de dicts: sin diccionario por instancia, cada campo ocupa un
+# puntero. Los escritores proyectan los atributos directo a columnas con attrgetter.
+
+class MicroserviceRecord:
+    # Microservicio aplanado de un export (salida de flatten_ms)
+    __slots__ = ('appName', 'repositoryUrl', 'buildConfigurationMode', 'tokenOcp', 'country', 'ocpLabel',
+                 'usage', 'project', 'baseImageVersion', 'quota_items', 'openshift_key', 'volume_path',
+                 'drs', 'pipeline_flags')
+
+    def __init__(self, appName, repositoryUrl, buildConfigurationMode, tokenOcp, country, ocpLabel, usage,
+                 project, baseImageVersion, quota_items, openshift_key, volume_path, drs, pipeline_flags):
+        self.appName = appName
+        self.repositoryUrl = repositoryUrl
+        self.buildConfigurationMode = buildConfigurationMode
+        self.tokenOcp = tokenOcp
+        self.country = country
+        self.ocpLabel = ocpLabel
+        self.usage = usage
+        self.project = project
+        self.baseImageVersion = baseImageVersion
+        self.quota_items = quota_items
+        self.openshift_key = openshift_key
+        self.volume_path = volume_path
+        self.drs = drs
+        self.pipeline_flags = pipeline_flags
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_state(cls, state):
+        # Registro desde la caché JSON de --incremental: JSON devuelve las tuplas como listas
+        if len(state) != len(cls.__slots__):
+            raise ValueError('registro cacheado con otra cantidad de campos')
+        rec = cls.__new__(cls)
+        rec.__setstate__(state)
+        rec.openshift_key = tuple(rec.openshift_key)
+        rec.drs = tuple(rec.drs)
+        rec.pipeline_flags = tuple(rec.pipeline_flags)
+        return rec
+
+
+class MicroserviceRow:
+    # Fila de microservice_properties_directory (un microservicio en un ambiente)
+    __slots__ = ('id', 'id_usage_directory', 'cpulimits', 'cpurequest', 'memorylimits', 'memoryrequest',
+                 'replicas', 'id_token_directory', 'id_openshift_properties_directory', 'id_path_directory',
+                 'id_image_directory', 'id_drs_config', 'id_quota_profile_directory', 'baseImageVersion')
+
+    def __init__(self, id, id_usage_directory, quota_item, replicas, id_token_directory,
+                 id_openshift_properties_directory, id_path_directory, baseImageVersion):
+        self.id = id
+        self.id_usage_directory = id_usage_directory
+        self.cpulimits = quota_item.get('cpuLimits')
+        self.cpurequest = quota_item.get('cpuRequest')
+        self.memorylimits = quota_item.get('memoryLimits')
+        self.memoryrequest = quota_item.get('memoryRequest')
+        self.replicas = replicas
+        self.id_token_directory = id_token_directory
+        self.id_openshift_properties_directory = id_openshift_properties_directory
+        self.id_path_directory = id_path_directory
+        self.id_image_directory = ''
+        self.id_drs_config = ''
+        self.id_quota_profile_directory = ''
+        self.baseImageVersion = baseImageVersion
+
+
+class GeneralRow:
+    # Fila de app_general_properties. Las columnas del modelo sin dato en los JSON
+    # (persona a cargo, runtime, datastage...) se guardan vacías para que la
+    # proyección a CSV sea un solo attrgetter.
+    __slots__ = ('id', 'id_project_directory', 'id_app_directory', 'id_person_in_charge', 'id_security_champion',
+                 'id_env_directory', 'id_country_directory', 'id_label_directory', 'id_app_type_directory',
+                 'id_pipeline_properties_directory', 'id_pipeline_general_properties_directory',
+                 'id_runtime_directory', 'sonarqubepath_exec', 'id_microservice_directory',
+                 'id_datastage_properties_directory', 'id_database_properties_directory',
+                 'id_was_properties_directory', 'id_pims_properties_directory',
+                 'project_name', 'env', 'record', 'source')
+
+    def __init__(self, id_microservice_directory, id_project_directory, id_app_directory, id_env_directory,
+                 id_country_directory, id_label_directory, project_name, env, record, source=None):
+        self.id = ''
+        self.id_project_directory = id_project_directory
+        self.id_app_directory = id_app_directory
+        self.id_person_in_charge = ''
+        self.id_security_champion = ''
+        self.id_env_directory = id_env_directory
+        self.id_country_directory = id_country_directory
+        self.id_label_directory = id_label_directory
+        self.id_app_type_directory = ''
+        self.id_pipeline_properties_directory = ''
+        self.id_pipeline_general_properties_directory = ''
+        self.id_runtime_directory = ''
+        self.sonarqubepath_exec = ''
+        self.id_microservice_directory = id_microservice_directory
+        self.id_datastage_properties_directory = ''
+        self.id_database_properties_directory = ''
+        self.id_was_properties_directory = ''
+        self.id_pims_properties_directory = ''
+        self.project_name = project_name
+        self.env = env
+        # appName, drs, pipeline_flags, etc. se leen del microservicio aplanado compartido
+        self.record = record
+        # SourceEntry del archivo de origen (país, tipo de app, ruta), si hay catálogo
+        self.source = source
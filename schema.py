@@ -0,0 +1,133 @@
+import os
+import re
+from operator import attrgetter, itemgetter
+from pathlib import Path
+
+# Registro de tablas de modelo.sql: columnas en orden, tipos y referencias de cada
+# tabla, parseados una sola vez por archivo. Es la única fuente de los encabezados de
+# los CSVs (jsontocsv.py), del orden de carga (dbload.py) y de las columnas de
+# upsert.sql (delta.py). Las filas se proyectan con attrgetter / itemgetter
+# precompilados sobre las columnas: cada fila sale como tupla sin armar un dict.
+
+SCHEMA_FILE = Path(__file__).with_name('modelo.sql')
+
+CREATE_TABLE_RE = re.compile(r'CREATE TABLE\s+(\w+)\s*\((.*?)\);', re.S | re.I)
+REFERENCES_RE = re.compile(r'REFERENCES\s+(\w+)\s*\(', re.I)
+
+
+# ========== PARSEO DE modelo.sql ==========
+
+def strip_sql_comments(sql_text):
+    return re.sub(r'--[^\n]*', '', sql_text)
+
+
+def split_columns(body):
+    # Separa las definiciones por comas que no estén dentro de paréntesis (VARCHAR(100), REFERENCES t(id))
+    parts, depth, current = [], 0, ''
+    for char in body:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_schema(sql_text):
+    # tabla -> {'columns': {columna: tipo}, 'references': [tablas]} en el orden del archivo
+    schema = {}
+    for table, body in CREATE_TABLE_RE.findall(strip_sql_comments(sql_text)):
+        columns = {}
+        references = []
+        for definition in split_columns(body):
+            name, _, rest = definition.partition(' ')
+            columns[name] = rest.split()[0].split('(')[0].upper() if rest else ''
+            references += [t for t in REFERENCES_RE.findall(rest) if t != table]
+        schema[table] = {'columns': columns, 'references': references}
+    return schema
+
+
+def load_order(schema):
+    # Orden topológico estable: cada tabla después de las que referencia
+    order, visiting = [], set()
+
+    def visit(table):
+        if table in order or table not in schema:
+            return
+        if table in visiting:
+            raise ValueError(f"Referencia circular en modelo.sql: {table}")
+        visiting.add(table)
+        for parent in schema[table]['references']:
+            visit(parent)
+        visiting.discard(table)
+        order.append(table)
+
+    for table in schema:
+        visit(table)
+    return order
+
+
+# ========== REGISTRO ==========
+
+def tuple_projector(columns, fields):
+    # Tupla armada en el orden fields -> tupla en el orden columns (itemgetter precompilado).
+    # Las columnas que fields no tiene salen vacías; si el orden ya es el mismo no se copia nada.
+    columns, fields = list(columns), list(fields)
+    if fields == columns:
+        return tuple
+    missing = len(fields)
+    positions = [fields.index(c) if c in fields else missing for c in columns]
+    getter = itemgetter(*positions) if len(positions) > 1 else lambda row: (row[positions[0]],)
+    if missing in positions:
+        return lambda row: getter(row + ('',))
+    return getter
+
+
+class SchemaRegistry(dict):
+    # Mismo contenido que parse_schema (tabla -> columnas y referencias), más consultas por tabla
+    def __init__(self, tables):
+        super().__init__(tables)
+        self.order = load_order(self)  # orden de carga por REFERENCES
+
+    @classmethod
+    def parse(cls, sql_text):
+        return cls(parse_schema(sql_text))
+
+    def columns(self, table, exclude=()):
+        # Columnas de la tabla en el orden de modelo.sql, sin las de exclude
+        if table not in self:
+            raise KeyError(f"La tabla {table} no existe en modelo.sql")
+        return [c for c in self[table]['columns'] if c not in exclude]
+
+    def types(self, table):
+        return self[table]['columns']
+
+    def attr_projector(self, table, exclude=()):
+        # Objeto (clase con un atributo por columna) -> tupla en el orden de las columnas
+        columns = self.columns(table, exclude)
+        if len(columns) == 1:
+            getter = attrgetter(columns[0])
+            return lambda obj: (getter(obj),)
+        return attrgetter(*columns)
+
+    def tuple_projector(self, table, fields, exclude=()):
+        return tuple_projector(self.columns(table, exclude), fields)
+
+
+_registries = {}
+
+
+def load_schema(schema_file=SCHEMA_FILE):
+    # Un registro por archivo, que se vuelve a parsear solo si el archivo cambió
+    path = os.path.abspath(schema_file)
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    cached = _registries.get(path)
+    if cached is None or cached[0] != signature:
+        cached = _registries[path] = (signature, SchemaRegistry.parse(Path(path).read_text(encoding='utf-8')))
+    return cached[1]
@@ -0,0 +1,93 @@
+import glob
+import os
+from pathlib import Path
+
+# Catálogo de archivos de entrada, armado con un solo recorrido de cada carpeta o
+# patrón: ruta, tamaño, mtime y país / tipo de app sacados del nombre
+# <Country>-<TYPE>.json. Las filas llevan su entrada del catálogo, así que el tipo de
+# app (y cualquier otro dato del archivo) sale de ahí sin volver a listar carpetas.
+#   --input .                    carpeta: sus *.json, sin recursión (comportamiento original)
+#   --input 'exports/**/*.json'  patrón glob, ** recorre subcarpetas
+
+GLOB_CHARS = ('*', '?', '[')
+
+
+class SourceEntry:
+    __slots__ = ('path', 'name', 'size', 'mtime_ns', 'country', 'app_type')
+
+    def __init__(self, path, size, mtime_ns):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # Argentina-MICROSERVICES.json -> ('Argentina', 'Microservices'); sin '-' no hay tipo
+        parts = self.name.split('-')
+        if len(parts) > 1:
+            self.country = parts[0]
+            self.app_type = parts[1].replace('.json', '').replace('_', ' ').capitalize()
+        else:
+            self.country = None
+            self.app_type = ''
+
+    def __repr__(self):
+        return f"SourceEntry({str(self.path)!r})"
+
+
+class SourceCatalog:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_name = {}
+        for entry in self.entries:
+            if entry.name in self.by_name:
+                # Los IDs y el manifiesto de --incremental se identifican por nombre de archivo
+                raise ValueError(f"{entry.name} aparece dos veces en las entradas: "
+                                 f"{self.by_name[entry.name].path} y {entry.path}")
+            self.by_name[entry.name] = entry
+        # app_type_directory: un id por tipo, en el orden de los archivos
+        self.app_type_ids = {}
+        for entry in self.entries:
+            if entry.app_type and entry.app_type not in self.app_type_ids:
+                self.app_type_ids[entry.app_type] = len(self.app_type_ids) + 1
+
+    @classmethod
+    def scan(cls, inputs, exclude_names=(), exclude_paths=()):
+        # Cada entrada en orden; dentro de cada una, orden alfabético (los IDs dependen del orden)
+        excluded = {Path(p).resolve() for p in exclude_paths}
+        entries, seen = [], set()
+        for source in inputs:
+            for entry in scan_input(source):
+                resolved = entry.path.resolve()
+                if entry.name in exclude_names or resolved in excluded or resolved in seen:
+                    continue
+                seen.add(resolved)
+                entries.append(entry)
+        return cls(entries)
+
+    @property
+    def paths(self):
+        return [entry.path for entry in self.entries]
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def app_type_id(self, entry):
+        return self.app_type_ids.get(entry.app_type, '') if entry is not None else ''
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def scan_input(source):
+    source = str(source)
+    if any(c in source for c in GLOB_CHARS):
+        entries = []
+        for path in sorted(glob.glob(source, recursive=True)):
+            if path.endswith('.json') and os.path.isfile(path):
+                st = os.stat(path)
+                entries.append(SourceEntry(path, st.st_size, st.st_mtime_ns))
+        return entries
+    # Carpeta: os.scandir trae el stat de cada archivo en el mismo recorrido
+    folder = Path(source)
+    with os.scandir(folder) as it:
+        found = [(e.name, e.stat()) for e in it if e.name.endswith('.json') and e.is_file()]
+    return [SourceEntry(folder / name, st.st_size, st.st_mtime_ns) for name, st in sorted(found, key=lambda f: f[0])]
@@ -0,0 +1,78 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+import jsontocsv
+from schema import load_schema
+
+# Carga de los exports de ejemplo del repositorio en una base SQLite creada desde
+# modelo.sql (--load-db), comparada contra los CSVs de la misma corrida.
+#   python -m pytest -q test_dbload.py   o   python -m unittest test_dbload
+
+REPO = Path(__file__).resolve().parent
+EXPORTS = sorted(p for p in REPO.glob('*-MICROSERVICES.json'))
+
+
+class DatabaseLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix='test_dbload-'))
+        self.inputs = self.tmp / 'exports'
+        self.inputs.mkdir()
+        for path in EXPORTS + [REPO / 'token.json']:
+            shutil.copy(path, self.inputs / path.name)
+        self.dsn = f"sqlite:///{self.tmp / 'catalogo.db'}"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def build(self, **options):
+        with redirect_stdout(StringIO()):
+            return jsontocsv.build_catalog([self.inputs], self.inputs / 'token.json', self.tmp / 'csv_output',
+                                           **options)
+
+    def connect(self):
+        conn = sqlite3.connect(self.tmp / 'catalogo.db')
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_row_counts_match_csv_run(self):
+        self.assertTrue(EXPORTS, 'No hay exports de ejemplo junto al test')
+        csv_rows = {Path(filename).stem: stats['rows'] for filename, stats in self.build()['tables'].items()}
+        db_tables = self.build(load_db=self.dsn)['tables']
+        conn = self.connect()
+        for filename, stats in db_tables.items():
+            table = Path(filename).stem
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self.assertEqual(count, stats['rows'], table)
+            self.assertEqual(count, csv_rows[table], table)
+        self.assertGreater(conn.execute("SELECT COUNT(*) FROM microservice_properties_directory").fetchone()[0], 0)
+        self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+
+    def test_schema_created_from_modelo_sql(self):
+        self.build(load_db=self.dsn)
+        conn = self.connect()
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertEqual(tables, set(load_schema()))
+
+    def test_reload_keeps_tables_the_pipeline_does_not_fill(self):
+        self.build(load_db=self.dsn)
+        conn = self.connect()
+        conn.execute("INSERT INTO person_in_charge (nombre, email) VALUES ('ana', 'ana@example.com')")
+        conn.commit()
+        first = conn.execute("SELECT COUNT(*) FROM app_general_properties").fetchone()[0]
+        self.build(load_db=self.dsn)
+        self.assertEqual(conn.execute("SELECT nombre FROM person_in_charge").fetchall(), [('ana',)])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM app_general_properties").fetchone()[0], first)
+        self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+
+    def test_rejects_stream(self):
+        with self.assertRaises(ValueError):
+            self.build(load_db=self.dsn, stream=True)
+
+
+if __name__ == '__main__':
+    unittest.main()